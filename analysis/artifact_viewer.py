@@ -7,6 +7,7 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 from analysis.run_manifest import read_manifest
+from analysis.trace_emitter import TraceStore
 
 # From trace_coverage_matrix: what is in traces vs results vs neither
 TRACE_COVERED = {"validate_config params", "validate_config outcome", "config status", "re-query decision"}
@@ -39,10 +40,11 @@ def main():
     # From traces
     if traces_dir.exists():
         trace_files = list(traces_dir.glob("*.json"))
-        if trace_files:
-            inferable.append(f"trace events ({len(trace_files)} files)")
+        store = TraceStore(run_path)
+        if trace_files or len(store):
+            inferable.append(f"trace events ({len(trace_files) + len(store)} traces)")
             # Check for decision_point, params, outcome
-            sample = json.loads((traces_dir / trace_files[0].name).read_text())
+            sample = json.loads(trace_files[0].read_text()) if trace_files else store.first()
             if "decision_point" in sample:
                 inferable.append("decision_point per trace")
             if "params" in sample:
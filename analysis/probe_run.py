@@ -3,9 +3,14 @@
 
 import argparse
 import json
+import sys
 from collections import Counter
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import trace
+
 
 def load_run(run_dir: Path) -> tuple[list[dict] | None, list[dict], dict | None]:
     run_dir = Path(run_dir)
@@ -14,12 +19,7 @@ def load_run(run_dir: Path) -> tuple[list[dict] | None, list[dict], dict | None]
     if results_path.exists():
         data = json.loads(results_path.read_text())
         records = data.get("records") if isinstance(data, dict) else None
-    trace_events = []
-    trace_path = run_dir / "trace.jsonl"
-    if trace_path.exists():
-        for line in trace_path.read_text().strip().split("\n"):
-            if line:
-                trace_events.append(json.loads(line))
+    trace_events = list(trace.iter_events(run_dir))
     meta = None
     meta_path = run_dir / "meta.json"
     if meta_path.exists():
@@ -9,6 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 from analysis.normalize_output import normalize_output
 from analysis.run_manifest import read_manifest
+from analysis.trace_emitter import TraceStore, load_traces as load_run_traces
 
 
 TRACE_NAMING_V1 = "v1"  # trace_0.json, trace_3.json
@@ -19,6 +20,8 @@ def infer_trace_naming(traces_dir: Path) -> str:
     """Infer trace naming version from filenames."""
     if not traces_dir.exists():
         return "none"
+    if (traces_dir / TraceStore.INDEX).exists():
+        return TRACE_NAMING_V2  # the consolidated store only exists with v2 emitters
     files = list(traces_dir.glob("*.json"))
     if not files:
         return "none"
@@ -47,16 +50,15 @@ def load_records(path):
 
 
 def load_traces(path):
-    """Load traces. Handles both v1 (trace_0) and v2 (trace_0_decision) naming."""
+    """Load traces. Handles both v1 (trace_0) and v2 (trace_0_decision) naming,
+    and the consolidated traces/traces.jsonl store alongside per-file traces."""
     p = Path(path)
     traces = {}
     if (p / "traces.json").exists():
         with open(p / "traces.json") as f:
             traces = json.load(f)
     elif (p / "traces").exists():
-        for f in (p / "traces").glob("*.json"):
-            with open(f) as fp:
-                traces[f.stem] = json.load(fp)
+        traces = load_run_traces(p)
     return traces
 
 
@@ -9,6 +9,9 @@ import sys
 from pathlib import Path
 from collections import defaultdict
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from analysis.trace_emitter import TraceStore
+
 
 def infer_type(val):
     if val is None:
@@ -92,8 +95,18 @@ def main():
 
     # Trace inventory
     traces_dir = run_path / "traces"
+    sample_trace = None
     if traces_dir.exists():
-        result["trace_inventory"] = [p.name for p in sorted(traces_dir.glob("*.json"))]
+        legacy = sorted(traces_dir.glob("*.json"))
+        store = TraceStore(run_path)
+        result["trace_inventory"] = [p.name for p in legacy]
+        # Consolidated store entries are listed by their legacy stem.
+        result["trace_inventory"] += [f"trace_{q}_{dp}" for q, dp in store.keys()]
+        if legacy:
+            with open(legacy[0]) as f:
+                sample_trace = json.load(f)
+        else:
+            sample_trace = store.first()
     else:
         traces_file = run_path / "traces.json"
         if traces_file.exists():
@@ -104,13 +117,7 @@ def main():
     # Expected trace fields (from spec)
     expected_trace_fields = {"decision_point", "params", "outcome", "timestamp"}
     if result["trace_inventory"]:
-        sample = traces_dir / result["trace_inventory"][0] if traces_dir.exists() else None
-        if sample and sample.exists():
-            with open(sample) as f:
-                sample_trace = json.load(f)
-            found = set(sample_trace.keys()) if isinstance(sample_trace, dict) else set()
-        else:
-            found = set()
+        found = set(sample_trace.keys()) if isinstance(sample_trace, dict) else set()
         result["missing_trace_fields"] = list(expected_trace_fields - found)
 
     print(json.dumps(result, indent=2))
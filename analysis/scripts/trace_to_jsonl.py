@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Export a run's trace (binary or JSON, rotated or not) as one trace.jsonl stream,
+so scripts that read trace.jsonl line by line can use binary-encoded runs."""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+import trace
+
+
+def export(run_dir: Path, out) -> int:
+    """Write every event of run_dir's trace to out as JSON lines. Returns the event count."""
+    n = 0
+    for event in trace.iter_events(run_dir):
+        out.write(json.dumps(event) + "\n")
+        n += 1
+    return n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("run_dir", type=Path, help="Run directory (or its trace.bin / trace.jsonl)")
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Output file (default stdout)")
+    args = parser.parse_args()
+    run_dir = args.run_dir.parent if args.run_dir.name in ("trace.bin", "trace.jsonl") else args.run_dir
+    if args.output is not None and args.output.resolve() == (run_dir / "trace.jsonl").resolve():
+        # iter_events reads both trace.bin and trace.jsonl, so this would double every event.
+        parser.error("output must not be the run's own trace.jsonl")
+
+    if args.output is None:
+        n = export(run_dir, sys.stdout)
+    else:
+        with open(args.output, "w") as f:
+            n = export(run_dir, f)
+    print(f"exported {n} events", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,167 @@
 """Trace emitter: emits trace events when processing run outputs.
 Used by run pipeline to record decision points.
+
+Two layouts are supported. Legacy: one traces/trace_{query_index}_{decision_point}.json
+per decision point. Consolidated (emit_trace(..., consolidated=True)): a TraceStore,
+i.e. one append-only traces/traces.jsonl per run plus an offset index. load_traces
+reads both.
 """
 
 import json
 from pathlib import Path
+from typing import Any, Iterator
 
 
-def emit_trace(run_path: Path, query_index: int, decision_point: str, params: dict, outcome: str) -> None:
-    """Emit a trace event for a decision point."""
-    traces_dir = run_path / "traces"
-    traces_dir.mkdir(parents=True, exist_ok=True)
+class TraceStore:
+    """All decision-point traces of a run in one append-only file with an offset index.
+
+    traces/traces.jsonl holds one compact JSON trace per line; traces/traces.idx
+    holds one [query_index, decision_point, offset, length] JSON line per trace,
+    written after its data, so get() can seek straight to any trace. A key
+    emitted twice resolves to its latest trace, as the legacy file overwrite did.
+    Index lines without complete data (e.g. after a crash) are ignored.
+    """
+
+    DATA = "traces.jsonl"
+    INDEX = "traces.idx"
+
+    def __init__(self, run_path: Path) -> None:
+        self.dir = Path(run_path) / "traces"
+        self._index: dict[tuple[Any, str], tuple[int, int]] | None = None
+        self._data = None
+        self._idx = None
+
+    @classmethod
+    def exists(cls, run_path: Path) -> bool:
+        return (Path(run_path) / "traces" / cls.INDEX).exists()
+
+    def _load_index(self) -> dict[tuple[Any, str], tuple[int, int]]:
+        if self._index is None:
+            self._index = {}
+            index_path = self.dir / self.INDEX
+            data_path = self.dir / self.DATA
+            if index_path.exists() and data_path.exists():
+                size = data_path.stat().st_size
+                with open(index_path) as f:
+                    for line in f:
+                        try:
+                            q, dp, offset, length = json.loads(line)
+                        except ValueError:
+                            continue  # torn last line
+                        if offset + length <= size:
+                            self._index[(q, dp)] = (offset, length)
+        return self._index
+
+    def append(self, query_index: Any, decision_point: str, trace: dict) -> None:
+        if self._data is not None and not (self.dir / self.DATA).exists():
+            # The run directory was removed (and maybe recreated) under us; start over.
+            self.close()
+            self._index = None
+        index = self._load_index()
+        if self._data is None:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._data = open(self.dir / self.DATA, "ab")
+            self._idx = open(self.dir / self.INDEX, "a")
+        line = (json.dumps(trace) + "\n").encode()
+        offset = self._data.tell()
+        self._data.write(line)
+        self._data.flush()
+        self._idx.write(json.dumps([query_index, decision_point, offset, len(line)]) + "\n")
+        self._idx.flush()
+        index[(query_index, decision_point)] = (offset, len(line))
+
+    def get(self, query_index: Any, decision_point: str) -> dict | None:
+        """One trace by key, read with a single seek; None if absent."""
+        entry = self._load_index().get((query_index, decision_point))
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.dir / self.DATA, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def keys(self) -> list[tuple[Any, str]]:
+        return list(self._load_index())
+
+    def first(self) -> dict | None:
+        """The first-emitted trace, read on its own; None if the store is empty."""
+        index = self._load_index()
+        return self.get(*next(iter(index))) if index else None
+
+    def items(self) -> Iterator[tuple[tuple[Any, str], dict]]:
+        """(key, trace) pairs in first-emitted order, reading the data file once."""
+        index = self._load_index()
+        if not index:
+            return
+        with open(self.dir / self.DATA, "rb") as f:
+            for key, (offset, length) in index.items():
+                f.seek(offset)
+                yield key, json.loads(f.read(length))
+
+    def __len__(self) -> int:
+        return len(self._load_index())
+
+    def close(self) -> None:
+        for f in (self._data, self._idx):
+            if f is not None:
+                f.close()
+        self._data = self._idx = None
+
+
+_stores: dict[Path, TraceStore] = {}
+
+
+def emit_trace(
+    run_path: Path,
+    query_index: int,
+    decision_point: str,
+    params: dict,
+    outcome: str,
+    *,
+    consolidated: bool = False,
+) -> None:
+    """Emit a trace event for a decision point.
+
+    consolidated=True appends to the run's TraceStore (kept open across calls)
+    instead of writing a separate JSON file. Call close_stores() when a run
+    is finished; a store whose run directory was deleted reopens on the next
+    call rather than writing to the removed file.
+    """
     # Emit trace for all decision points including commit_author_selection
     trace = {"decision_point": decision_point, "params": params, "outcome": outcome}
+    if consolidated:
+        key = Path(run_path).resolve()
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TraceStore(run_path)
+        store.append(query_index, decision_point, trace)
+        return
+    traces_dir = run_path / "traces"
+    traces_dir.mkdir(parents=True, exist_ok=True)
     out = traces_dir / f"trace_{query_index}_{decision_point}.json"
     with open(out, "w") as f:
         json.dump(trace, f, indent=2)
+
+
+def close_stores() -> None:
+    """Close the files held open by consolidated emit_trace calls."""
+    for store in _stores.values():
+        store.close()
+    _stores.clear()
+
+
+def load_traces(run_path: Path) -> dict[str, dict]:
+    """All traces of a run keyed by legacy file stem (trace_{query_index}_{decision_point}).
+
+    Reads legacy traces/*.json files and the consolidated store; on a key in
+    both, the consolidated trace wins.
+    """
+    traces_dir = Path(run_path) / "traces"
+    traces = {}
+    if traces_dir.exists():
+        for f in sorted(traces_dir.glob("*.json")):
+            with open(f) as fp:
+                traces[f.stem] = json.load(fp)
+    for (q, dp), trace in TraceStore(run_path).items():
+        traces[f"trace_{q}_{dp}"] = trace
+    return traces
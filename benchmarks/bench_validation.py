@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Benchmark validation: per-record interpreted checks vs compiled schema vs columnar."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import validation
+from validation import compile_schema, validate_record
+
+REQUIRED = ["name", "count"]
+TYPES = {"name": str, "count": int}
+MIN_COUNT = 0
+
+
+def make_records(n: int, csv_like: bool) -> list[dict]:
+    if csv_like:
+        return [{"name": f"r{i}", "count": str(i % 100)} for i in range(n)]
+    return [{"name": f"r{i}", "count": i % 100} for i in range(n)]
+
+
+def interpreted(records: list[dict]) -> None:
+    """Row-wise path validate() used before compile_schema existed."""
+    for i, rec in enumerate(records):
+        validate_record(rec, i, required=REQUIRED, types=TYPES, min_count=MIN_COUNT)
+
+
+def compiled(records: list[dict]) -> None:
+    compile_schema(REQUIRED, TYPES, MIN_COUNT).validate(records)
+
+
+def columnar(records: list[dict]) -> None:
+    compile_schema(REQUIRED, TYPES, MIN_COUNT).validate_columnar(records)
+
+
+def best_of(fn, records: list[dict], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for label, csv_like in [("json (int count)", False), ("csv (str count)", True)]:
+        records = make_records(args.rows, csv_like)
+        base = best_of(interpreted, records, args.repeat)
+        fast = best_of(compiled, records, args.repeat)
+        cols = best_of(columnar, records, args.repeat)
+        print(
+            f"{label}: {args.rows} rows  interpreted {base:.3f}s  "
+            f"compiled {fast:.3f}s ({base / fast:.2f}x)  columnar {cols:.3f}s ({base / cols:.2f}x)"
+        )
+    print(f"numpy: {'yes' if validation._np is not None else 'no (stdlib array fallback)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Content-addressed on-disk cache for ingest results."""
+
+import hashlib
+import json
+import marshal
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any
+
+# Bump when the entry layout or the meaning of cached records changes.
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 256 << 20
+
+
+def _option_default(value: Any) -> str:
+    # types maps fields to classes; key them by name.
+    return getattr(value, "__qualname__", None) or repr(value)
+
+
+class IngestCache:
+    """Records cached on disk under a hash of raw input, format and options.
+
+    Each entry is one file: the records serialized with marshal and
+    compressed with zlib. Reads bump the file's mtime, and after every put
+    the least recently used entries are deleted until the directory holds
+    at most max_bytes. Unreadable entries are dropped and count as misses.
+    """
+
+    SUFFIX = ".rec"
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key(self, raw: str | bytes, format: str, options: dict[str, Any]) -> str:
+        """sha256 hex digest of the cache version, format, options and raw bytes."""
+        h = hashlib.sha256()
+        h.update(json.dumps([CACHE_VERSION, format, options], sort_keys=True, default=_option_default).encode())
+        h.update(b"\0")
+        h.update(raw.encode() if isinstance(raw, str) else raw)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.SUFFIX}"
+
+    def get(self, key: str) -> list[dict[str, Any]] | None:
+        """Cached records for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            records = marshal.loads(zlib.decompress(data))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            path.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return records
+
+    def put(self, key: str, records: list[dict[str, Any]]) -> None:
+        """Store records under key, then evict down to max_bytes.
+
+        Records holding values marshal cannot serialize are not cached.
+        """
+        try:
+            data = zlib.compress(marshal.dumps(records), 1)
+        except ValueError:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the total is within max_bytes. Returns count deleted."""
+        entries = []
+        total = 0
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, path))
+            total += st.st_size
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            path.unlink(missing_ok=True)
@@ -7,6 +7,12 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 RUNS_DIR = ROOT / "runs"
+sys.path.insert(0, str(ROOT))
+
+import trace
+
+# Differ on every run: wall clock, span timings, and span ids (a process-wide counter).
+TIMING_FIELDS = ("ts", "span_id", "parent_id", "start_ns", "end_ns", "duration_ns")
 
 
 def get_latest_surface_runs() -> list[Path]:
@@ -22,18 +28,31 @@ def get_latest_surface_runs() -> list[Path]:
 
 
 def normalize_trace_for_diff(trace_path: Path) -> list[dict]:
-    """Event types and payload only; drop ts for comparison."""
-    if not trace_path.exists():
-        return []
+    """Event types and payload from all trace segments; drop timing fields and the trace_summary bookkeeping event for comparison."""
     events = []
-    for line in trace_path.read_text().strip().split("\n"):
-        if not line:
+    for e in trace.iter_events(trace_path):
+        if e.get("event") == "trace_summary":
             continue
-        e = json.loads(line)
-        events.append({"event": e.get("event"), "source": e.get("source"), **{k: v for k, v in e.items() if k not in ("ts", "event", "source")}})
+        events.append({"event": e.get("event"), "source": e.get("source"), **{k: v for k, v in e.items() if k not in ("event", "source", *TIMING_FIELDS)}})
     return events
 
 
+def unrecorded_counts(trace_path: Path) -> dict[str, int]:
+    """Events emitted but not in the file: {event name: sampled-out count, "(dropped)": queue drops}.
+
+    Read from the trace_summary event that sampled or async traces end with.
+    """
+    counts: dict[str, int] = {}
+    for e in trace.iter_events(trace_path):
+        if e.get("event") != "trace_summary":
+            continue
+        for name, n in e.get("sampled_out", {}).items():
+            counts[name] = counts.get(name, 0) + n
+        if e.get("dropped"):
+            counts["(dropped)"] = counts.get("(dropped)", 0) + e["dropped"]
+    return counts
+
+
 def main() -> str:
     run_dirs = get_latest_surface_runs()
     if len(run_dirs) < 2:
@@ -52,14 +71,21 @@ def main() -> str:
             summary.append(f"    first value type: {type(v).__name__}")
     summary.append("\n=== Traces (trace.jsonl, ts stripped) ===\n")
     traces = {}
+    run_dirs_by_label = {}
     for d in run_dirs:
         data = json.loads((d / "results.json").read_text())
         label = data.get("label", d.name)
         traces[label] = normalize_trace_for_diff(d / "trace.jsonl")
+        run_dirs_by_label[label] = d
     base = list(traces.values())[0]
     for label, evs in traces.items():
         same = evs == base
         summary.append(f"  {label}: {len(evs)} events, same shape as first: {same}")
+        missing = unrecorded_counts(run_dirs_by_label[label] / "trace.jsonl")
+        if missing:
+            # Shapes of sampled traces differ by design; compare totals instead.
+            detail = ", ".join(f"{name} x{n}" for name, n in sorted(missing.items()))
+            summary.append(f"    not recorded (sampled out / dropped): {detail}; total emitted {len(evs) + sum(missing.values())}")
     summary.append("\n=== Real differences vs noise ===\n")
     summary.append("  Output: JSON has int for count, CSV has str (real). Order preserved (real). File name has no effect on output (noise for content).\n")
     summary.append("  Trace: All runs have same event types (keys_normalized); only ts differs (noise). Format/order/filename not logged (noise in trace).\n")
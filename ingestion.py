@@ -1,17 +1,65 @@
 """Basic ingestion pipeline: parse -> validate -> (optionally) save."""
 
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import chain, islice
+from pathlib import Path
 from typing import Any
 
-from parsers import parse_csv, parse_json
-from storage import Storage
-from validation import validate
+from cache import DEFAULT_MAX_BYTES, IngestCache
+from parsers import ParseError, iter_csv, iter_json, iter_ndjson, open_mmap, parse_csv, parse_json, parse_ndjson
+from storage import AsyncStorage, SQLiteStorage, Storage
+from validation import (
+    CompiledSchema,
+    ValidationError,
+    ValidationReport,
+    ValidationReportError,
+    compile_schema,
+    validate,
+    validate_all,
+    validate_columnar,
+)
 
 try:
     import trace as _trace
 except ImportError:
     _trace = None
 
+_spanned = _trace.spanned if _trace else lambda *args, **kwargs: lambda fn: fn
 
+
+_cache: IngestCache | None = None
+
+
+def enable_cache(directory: str | Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES) -> IngestCache:
+    """Make ingest() reuse results for identical raw input, format and options.
+
+    directory defaults to data/ingest_cache next to this module. Setting the
+    INGEST_CACHE_DIR environment variable enables the cache at import time.
+    """
+    global _cache
+    _cache = IngestCache(directory or Path(__file__).resolve().parent / "data" / "ingest_cache", max_bytes)
+    return _cache
+
+
+def disable_cache() -> None:
+    global _cache
+    _cache = None
+
+
+if os.environ.get("INGEST_CACHE_DIR"):
+    enable_cache(os.environ["INGEST_CACHE_DIR"])
+
+
+@_spanned("normalize", "ingestion.normalize_record_keys")
 def normalize_record_keys(records: list[dict[str, Any]]) -> list[dict[str, Any]]:
     """Lowercase all keys in each record. Used when normalize_keys=True."""
     out = [{k.lower(): v for k, v in r.items()} for r in records]
@@ -20,6 +68,7 @@ def normalize_record_keys(records: list[dict[str, Any]]) -> list[dict[str, Any]]
     return out
 
 
+@_spanned("ingest", "ingestion.ingest")
 def ingest(
     raw: str,
     format: str,
@@ -28,17 +77,53 @@ def ingest(
     dry_run: bool = False,
     skip_validation: bool = False,
     normalize_keys: bool = False,
+    infer_types: bool = False,
     required: list[str] | None = None,
     types: dict[str, type] | None = None,
     min_count: int | None = None,
+    collect_errors: bool = False,
+    max_error_indices: int = 10,
+    columnar: bool = False,
 ) -> list[dict[str, Any]]:
-    """Parse, validate (unless skipped), optionally save. Returns records."""
-    if format == "json":
-        records = parse_json(raw)
-    elif format == "csv":
-        records = parse_csv(raw)
-    else:
-        raise ValueError(f"unknown format: {format}")
+    """Parse, validate (unless skipped), optionally save. Returns records.
+
+    With collect_errors=True validation checks every record and raises a single
+    ValidationReportError (its .report groups errors by class and field) instead
+    of stopping at the first bad record. columnar=True validates column at a
+    time (faster on large batches, same errors). infer_types=True converts
+    numeric CSV columns (see parsers.iter_csv); JSON input is unaffected.
+
+    With the cache enabled (enable_cache) a repeat of the same raw input,
+    format and result-affecting options returns the stored records without
+    parsing or validating; only successful results are cached.
+    """
+    cache_key = None
+    if _cache is not None:
+        cache_key = _cache.key(raw, format, {
+            "normalize_keys": normalize_keys,
+            "infer_types": infer_types,
+            "skip_validation": skip_validation,
+            "required": required or [],
+            "types": types or {},
+            "min_count": min_count,
+        })
+        records = _cache.get(cache_key)
+        if records is not None:
+            if _trace:
+                _trace.emit("cache_hit", "ingestion.ingest", key=cache_key[:12], record_count=len(records))
+            if storage and not dry_run:
+                storage.save(records)
+            return records
+
+    with _trace.span("parse", "ingestion.ingest", format=format) if _trace else nullcontext():
+        if format == "json":
+            records = parse_json(raw)
+        elif format == "csv":
+            records = parse_csv(raw, infer_types=infer_types)
+        elif format == "ndjson":
+            records = parse_ndjson(raw)
+        else:
+            raise ValueError(f"unknown format: {format}")
 
     # NOTE: Key normalization uses normalize_record_keys (lowercase only).
     # We intentionally do NOT apply canonical snake_case normalization here
@@ -48,14 +133,545 @@ def ingest(
         records = normalize_record_keys(records)
 
     if not skip_validation:
-        validate(
-            records,
-            required=required or [],
-            types=types or {},
-            min_count=min_count,
-        )
+        if collect_errors:
+            report = validate_all(
+                records,
+                required=required or [],
+                types=types or {},
+                min_count=min_count,
+                max_indices=max_error_indices,
+            )
+            if not report.ok:
+                raise ValidationReportError(report)
+        else:
+            validator = validate_columnar if columnar else validate
+            validator(
+                records,
+                required=required or [],
+                types=types or {},
+                min_count=min_count,
+            )
+
+    if cache_key is not None:
+        _cache.put(cache_key, records)
 
     if storage and not dry_run:
         storage.save(records)
 
     return records
+
+
+async def aingest(
+    raw: str,
+    format: str,
+    storage: AsyncStorage | None = None,
+    *,
+    dry_run: bool = False,
+    skip_validation: bool = False,
+    normalize_keys: bool = False,
+    infer_types: bool = False,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+    collect_errors: bool = False,
+    max_error_indices: int = 10,
+    yield_every: int = 1000,
+) -> list[dict[str, Any]]:
+    """Async ingest for callers running inside an event loop. Same results and errors as ingest.
+
+    Parse, normalize and validate each run on the loop in slices of
+    yield_every records, awaiting asyncio.sleep(0) between slices so other
+    tasks are not starved. The save goes through an AsyncStorage (e.g.
+    storage.ThreadedStorage), which keeps blocking I/O off the loop.
+    """
+    if format == "json":
+        parsed = iter_json(raw)
+    elif format == "csv":
+        parsed = iter_csv(raw, infer_types=infer_types)
+    elif format == "ndjson":
+        parsed = iter_ndjson(raw)
+    else:
+        raise ValueError(f"unknown format: {format}")
+
+    records: list[dict[str, Any]] = []
+    for rec in parsed:
+        records.append(rec)
+        if len(records) % yield_every == 0:
+            await asyncio.sleep(0)
+
+    if normalize_keys:
+        for i, r in enumerate(records):
+            records[i] = {k.lower(): v for k, v in r.items()}
+            if i % yield_every == 0:
+                await asyncio.sleep(0)
+        if _trace:
+            _trace.emit("keys_normalized", "ingestion.aingest", record_count=len(records))
+
+    if not skip_validation:
+        schema = compile_schema(required, types, min_count)
+        report = ValidationReport(max_error_indices) if collect_errors else None
+        for i, rec in enumerate(records):
+            if report is None:
+                schema.check(rec, i)
+            else:
+                schema.collect(rec, i, report)
+            if i % yield_every == 0:
+                await asyncio.sleep(0)
+        if report is not None and not report.ok:
+            raise ValidationReportError(report)
+
+    if storage and not dry_run:
+        await storage.save(records)
+
+    return records
+
+
+def _iter_normalized(records: Iterator[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Lazy counterpart of normalize_record_keys. Emits one trace event when exhausted."""
+    n = 0
+    for r in records:
+        n += 1
+        yield {k.lower(): v for k, v in r.items()}
+    if _trace:
+        _trace.emit("keys_normalized", "ingestion.ingest_stream", record_count=n)
+
+
+def _iter_validated(
+    records: Iterator[dict[str, Any]],
+    schema: CompiledSchema,
+    report: ValidationReport | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Check records as they pass. With a report, collect errors and raise at the end."""
+    if report is None:
+        check = schema.check
+        for i, rec in enumerate(records):
+            check(rec, i)
+            yield rec
+        return
+    for i, rec in enumerate(records):
+        schema.collect(rec, i, report)
+        yield rec
+    if not report.ok:
+        raise ValidationReportError(report)
+
+
+_DONE = object()
+
+
+class _PipelineStopped(Exception):
+    """Raised inside a stage thread when the pipeline is shut down early."""
+
+
+class _Pipeline:
+    """Runs ingest stages on threads joined by bounded queues.
+
+    stage(records) moves the production of `records` onto a new thread and
+    returns an iterator that reads its output, batch_size records at a time,
+    from a queue holding at most depth batches. A full queue blocks the
+    producer, so no stage runs more than depth batches ahead of the next one.
+    An exception in a stage is passed down the queue and re-raised by the
+    consumer. close() stops every stage and joins the threads.
+    """
+
+    def __init__(self, depth: int = 4, batch_size: int = 1000) -> None:
+        self.depth = depth
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def stage(self, records: Iterator[dict[str, Any]], name: str) -> Iterator[dict[str, Any]]:
+        q: queue.Queue = queue.Queue(self.depth)
+        thread = threading.Thread(target=self._produce, args=(records, q), name=f"ingest-{name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return chain.from_iterable(self._consume(q))
+
+    def close(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _produce(self, records: Iterator[dict[str, Any]], q: queue.Queue) -> None:
+        it = iter(records)
+        try:
+            while True:
+                batch = list(islice(it, self.batch_size))
+                if not batch:
+                    break
+                self._put(q, batch)
+            self._put(q, _DONE)
+        except _PipelineStopped:
+            pass
+        except BaseException as e:
+            try:
+                self._put(q, e)
+            except _PipelineStopped:
+                pass
+
+    def _put(self, q: queue.Queue, item: Any) -> None:
+        while True:
+            if self._stop.is_set():
+                raise _PipelineStopped
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _consume(self, q: queue.Queue) -> Iterator[list[dict[str, Any]]]:
+        while True:
+            if self._stop.is_set():
+                raise _PipelineStopped
+            try:
+                item = q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def ingest_stream(
+    source: Any,
+    format: str,
+    storage: Storage | None = None,
+    *,
+    dry_run: bool = False,
+    skip_validation: bool = False,
+    normalize_keys: bool = False,
+    infer_types: bool = False,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+    collect_errors: bool = False,
+    max_error_indices: int = 10,
+    pipelined: bool = False,
+    queue_depth: int = 4,
+    batch_size: int = 1000,
+) -> dict[str, Any]:
+    """Streaming ingest: records flow one at a time through parse -> normalize ->
+    validate -> save. source is a str, a file object or an iterable of byte chunks.
+
+    Returns a summary dict instead of the records. A validation error raised
+    mid-stream propagates out of storage.save_iter, so nothing is committed.
+    collect_errors works as in ingest; the error is raised once the stream ends.
+
+    pipelined=True runs parsing and normalize+validate on their own threads,
+    handing batch_size-record batches to the next stage through queues at
+    most queue_depth batches deep, while the calling thread writes. Storage
+    I/O (sqlite3 releases the GIL) then overlaps parsing instead of following it.
+    """
+    if format == "json":
+        records = iter_json(source)
+    elif format == "csv":
+        records = iter_csv(source, infer_types=infer_types)
+    elif format == "ndjson":
+        records = iter_ndjson(source)
+    else:
+        raise ValueError(f"unknown format: {format}")
+
+    pipe = _Pipeline(queue_depth, batch_size) if pipelined else None
+    if pipe:
+        records = pipe.stage(records, "parse")
+
+    if normalize_keys:
+        records = _iter_normalized(records)
+
+    if not skip_validation:
+        schema = compile_schema(required, types, min_count)
+        report = ValidationReport(max_error_indices) if collect_errors else None
+        records = _iter_validated(records, schema, report)
+
+    if pipe and (normalize_keys or not skip_validation):
+        records = pipe.stage(records, "validate")
+
+    saved = bool(storage) and not dry_run
+    try:
+        if saved:
+            count = storage.save_iter(records)
+        else:
+            count = sum(1 for _ in records)
+    finally:
+        if pipe:
+            pipe.close()
+
+    return {"format": format, "record_count": count, "saved": saved}
+
+
+def ingest_file(
+    path: str | Path,
+    format: str,
+    storage: Storage | None = None,
+    *,
+    use_mmap: bool = False,
+    **options: Any,
+) -> dict[str, Any]:
+    """ingest_stream over a file on disk. options are ingest_stream's keywords.
+
+    use_mmap=True parses straight from a read-only memory map of the file and
+    decodes one chunk at a time, so no full bytes or str copy is ever built.
+    """
+    if use_mmap:
+        with open_mmap(path) as buf:
+            return ingest_stream(buf, format, storage, **options)
+    with open(path, "rb") as f:
+        return ingest_stream(f, format, storage, **options)
+
+
+def _tracked_lines(f: Any, state: dict[str, Any], digest: Any) -> Iterator[bytes]:
+    """Yield lines from binary file f, advancing state["offset"] and state["line"]
+    and feeding digest as each is handed out."""
+    for line in f:
+        state["offset"] += len(line)
+        state["line"] += 1
+        digest.update(line)
+        yield line
+
+
+def _hash_prefix(f: Any, size: int, digest: Any) -> bool:
+    """Feed the first size bytes of f to digest, leaving f at size.
+
+    Returns False if the file is shorter or size does not fall on a line start.
+    """
+    f.seek(0)
+    remaining, last = size, b"\n"
+    while remaining:
+        chunk = f.read(min(remaining, 1 << 20))
+        if not chunk:
+            return False
+        digest.update(chunk)
+        remaining -= len(chunk)
+        last = chunk[-1:]
+    return last == b"\n"
+
+
+def ingest_checkpointed(
+    path: str | Path,
+    format: str,
+    storage: SQLiteStorage,
+    *,
+    checkpoint_every: int = 10_000,
+    resume: bool = False,
+    skip_validation: bool = False,
+    normalize_keys: bool = False,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+) -> dict[str, Any]:
+    """Resumable file ingest into a rows-schema SQLiteStorage.
+
+    Every checkpoint_every records the batch is appended together with a
+    checkpoint (byte offset, line and record index just past the batch) in
+    one transaction. A failure mid-file loses at most the current batch;
+    the records already committed stay. With resume=True a run picks up
+    from the stored checkpoint: CSV and NDJSON seek to the byte offset,
+    JSON re-parses and skips the committed records. Without resume any
+    existing records and checkpoint are replaced.
+
+    The checkpoint also holds a SHA-256 of the committed input (the bytes
+    before the offset; for JSON, the skipped records), so resuming after
+    the input changed before that point raises ValueError. Editing the
+    uncommitted rest, e.g. to fix the record that failed, is fine.
+
+    Record indices in validation errors and NDJSON line numbers refer to the
+    whole file. CSV type inference and collect_errors are not available here.
+    """
+    if format not in ("json", "csv", "ndjson"):
+        raise ValueError(f"unknown format: {format}")
+    if checkpoint_every < 1:
+        raise ValueError(f"checkpoint_every must be >= 1, got {checkpoint_every}")
+    source = str(Path(path).resolve())
+    start = storage.checkpoint() if resume else None
+    if start is not None and (start["source"], start["format"]) != (source, format):
+        raise ValueError(f"checkpoint is for {start['format']} input {start['source']}, not {source}")
+    if start is None:
+        storage.save([])
+        start = {"source": source, "format": format, "offset": 0, "line": 0, "records": 0, "done": False}
+    elif _trace:
+        _trace.emit("ingest_resumed", "ingestion.ingest_checkpointed",
+                    record_index=start["records"], offset=start["offset"])
+
+    state = dict(start)
+    summary = {"format": format, "record_count": start["records"], "saved": True, "resumed_from": start["records"]}
+    if start["done"]:
+        return summary
+
+    schema = None if skip_validation else compile_schema(required, types, min_count)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if format == "json":
+            records = iter_json(f)
+            for rec in islice(records, start["records"]):
+                digest.update(json.dumps(rec, sort_keys=True).encode())
+            unchanged = True
+        else:
+            header = f.readline() if format == "csv" else b""
+            if state["offset"] < len(header):
+                state["offset"], state["line"] = len(header), 1
+            unchanged = _hash_prefix(f, state["offset"], digest)
+        if not unchanged or start.get("digest", digest.hexdigest()) != digest.hexdigest():
+            raise ValueError(f"{source} changed before the checkpoint at record {start['records']}; "
+                             "ingest it again without resume")
+        if format == "csv":
+            records = iter_csv(chain([header], _tracked_lines(f, state, digest)))
+        elif format == "ndjson":
+            records = iter_ndjson(_tracked_lines(f, state, digest))
+
+        index = start["records"]
+        batch: list[dict[str, Any]] = []
+        try:
+            for rec in records:
+                if format == "json":
+                    digest.update(json.dumps(rec, sort_keys=True).encode())
+                if normalize_keys:
+                    rec = {k.lower(): v for k, v in rec.items()}
+                if schema is not None:
+                    schema.check(rec, index)
+                batch.append(rec)
+                index += 1
+                if len(batch) >= checkpoint_every:
+                    storage.append_checkpointed(batch, dict(state, records=index, digest=digest.hexdigest()))
+                    batch = []
+        except ParseError as e:
+            if e.line is None:
+                raise
+            raise ParseError(e.detail, line=e.line + start["line"]) from e
+        storage.append_checkpointed(batch, dict(state, records=index, done=True, digest=digest.hexdigest()))
+
+    if normalize_keys and _trace:
+        _trace.emit("keys_normalized", "ingestion.ingest_checkpointed", record_count=index - start["records"])
+    summary["record_count"] = index
+    return summary
+
+
+def _shard_bounds(path: str | Path, start: int, shards: int) -> list[tuple[int, int]]:
+    """Split [start, EOF) into up to `shards` byte ranges that begin at line starts."""
+    size = os.path.getsize(path)
+    cuts = [start]
+    with open(path, "rb") as f:
+        for k in range(1, shards):
+            target = start + (size - start) * k // shards
+            if target <= cuts[-1]:
+                continue
+            f.seek(target - 1)
+            f.readline()  # finish the line the target falls in
+            pos = f.tell()
+            if cuts[-1] < pos < size:
+                cuts.append(pos)
+    cuts.append(size)
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def _ingest_shard(
+    path: str,
+    format: str,
+    header: bytes,
+    start: int,
+    end: int,
+    normalize_keys: bool,
+    schema: CompiledSchema | None,
+) -> tuple[list[dict[str, Any]], Exception | None, int]:
+    """Worker: parse, normalize and validate one byte range.
+
+    Returns (records, first error or None, newline count). Error indices and
+    line numbers are shard-local; the caller remaps them.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.count(b"\n")
+    records: list[dict[str, Any]] = []
+    try:
+        parsed = iter_csv(header + data) if format == "csv" else iter_ndjson(data)
+        for i, rec in enumerate(parsed):
+            if normalize_keys:
+                rec = {k.lower(): v for k, v in rec.items()}
+            if schema is not None:
+                schema.check(rec, i)
+            records.append(rec)
+    except (ValidationError, ParseError) as e:
+        return records, e, lines
+    return records, None, lines
+
+
+def parallel_ingest(
+    path: str | Path,
+    format: str,
+    storage: Storage | None = None,
+    *,
+    workers: int | None = None,
+    shard_bytes: int = 64 << 20,
+    dry_run: bool = False,
+    skip_validation: bool = False,
+    normalize_keys: bool = False,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+) -> dict[str, Any]:
+    """Ingest a CSV or NDJSON file with parse/normalize/validate sharded across processes.
+
+    The file is cut at line starts into at least `workers` shards of about
+    shard_bytes each, so CSV fields must not contain newlines. At most
+    2 * workers shards are in flight and each result is released once
+    saved, so the parent holds a bounded window of records rather than the
+    whole file. Shard results are written in file order through one
+    storage.save_iter call; the first error (in file order) is raised with
+    its record index or line number remapped to the whole file, and nothing
+    is saved.
+    """
+    if format not in ("csv", "ndjson"):
+        raise ValueError(f"parallel_ingest supports csv and ndjson, not {format}")
+    path = str(path)
+    workers = workers or os.cpu_count() or 1
+    header = b""
+    if format == "csv":
+        with open(path, "rb") as f:
+            header = f.readline()
+    schema = None if skip_validation else compile_schema(required, types, min_count)
+    shards = max(workers, -(-(os.path.getsize(path) - len(header)) // max(1, shard_bytes)))
+    bounds = _shard_bounds(path, len(header), shards)
+    summary = {"format": format, "record_count": 0, "saved": bool(storage) and not dry_run, "shards": len(bounds)}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        todo = iter(bounds)
+        futures: deque = deque()
+
+        def submit_next() -> None:
+            bound = next(todo, None)
+            if bound is not None:
+                futures.append(pool.submit(_ingest_shard, path, format, header, *bound, normalize_keys, schema))
+
+        for _ in range(2 * workers):
+            submit_next()
+
+        def merged() -> Iterator[dict[str, Any]]:
+            line_offset = 1 if header else 0
+            while futures:
+                records, error, lines = futures.popleft().result()
+                submit_next()
+                if isinstance(error, ParseError):
+                    raise ParseError(error.detail, line=None if error.line is None else error.line + line_offset)
+                if error is not None:
+                    error.index += summary["record_count"]
+                    raise error
+                summary["record_count"] += len(records)
+                line_offset += lines
+                yield from records
+                del records
+
+        try:
+            if summary["saved"]:
+                storage.save_iter(merged())
+            else:
+                for _ in merged():
+                    pass
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    if normalize_keys and _trace:
+        _trace.emit("keys_normalized", "ingestion.parallel_ingest", record_count=summary["record_count"])
+    return summary
@@ -1,20 +1,274 @@
-"""Parse JSON and CSV into a common record format: list of dicts."""
+"""Parse JSON, NDJSON and CSV into a common record format: list of dicts."""
 
+import codecs
 import csv
-import io
 import json
+import mmap
+import os
+import re
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from itertools import chain, islice
+from pathlib import Path
 from typing import Any
 
+CHUNK_SIZE = 1 << 16
+SAMPLE_SIZE = 100
+
+_INT_RE = re.compile(r"[+-]?(0|[1-9][0-9]*)")
+_WS_RE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+_FLOAT_RE = re.compile(r"[+-]?((0|[1-9][0-9]*)(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]+)?")
+
+
+class ParseError(ValueError):
+    """Malformed input. line is 1-based where the format has lines; msg is
+    detail prefixed with the line number when one is known."""
+
+    def __init__(self, detail: str, line: int | None = None):
+        msg = f"line {line}: {detail}" if line is not None else detail
+        super().__init__(msg)
+        self.msg = msg
+        self.detail = detail
+        self.line = line
+
+    def __reduce__(self):
+        return (type(self), (self.detail, self.line))
+
 
 def parse_json(raw: str) -> list[dict[str, Any]]:
     """Parse JSON into list of records. Single object becomes one-item list."""
     data = json.loads(raw)
     if isinstance(data, dict):
         return [data]
+    if isinstance(data, list):
+        return data
     return list(data)
 
 
-def parse_csv(raw: str) -> list[dict[str, Any]]:
-    """Parse CSV into list of records. First row = headers. Keys lowercased."""
-    reader = csv.DictReader(io.StringIO(raw))
-    return [{k.lower(): v for k, v in row.items()} for row in reader]
+def parse_csv(raw: str, *, infer_types: bool = False) -> list[dict[str, Any]]:
+    """Parse CSV into list of records. First row = headers. Keys lowercased.
+
+    Values stay strings unless infer_types=True (see iter_csv).
+    """
+    return list(iter_csv(raw, infer_types=infer_types))
+
+
+def parse_ndjson(raw: str) -> list[dict[str, Any]]:
+    """Parse newline-delimited JSON: one object per line, blank lines skipped."""
+    return list(iter_ndjson(raw))
+
+
+def iter_text_chunks(source: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield decoded text chunks from a str, a bytes-like buffer (bytes, memoryview,
+    mmap), a file object (text or binary), or an iterable of bytes/str chunks.
+    Bytes are decoded incrementally as UTF-8, one chunk at a time."""
+    if isinstance(source, str):
+        for start in range(0, len(source), chunk_size):
+            yield source[start:start + chunk_size]
+        return
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        chunks: Iterable[Any] = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    elif hasattr(source, "read"):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = source
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in chunks:
+        text = decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+@contextmanager
+def open_mmap(path: str | Path) -> Iterator[mmap.mmap | bytes]:
+    """Map a file read-only for use as a parser source. Empty files yield b"".
+
+    Pages are faulted in as the parser reaches them, so nothing is read up front.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def iter_lines(source: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Yield "\\n"-terminated lines (terminator kept) from any source accepted by iter_text_chunks."""
+    pending = ""
+    for chunk in iter_text_chunks(source, chunk_size):
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def iter_json(source: Any, *, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """Yield records from a JSON source. Same shape rules as parse_json.
+
+    A top-level array is decoded incrementally: elements are pulled out of a
+    sliding text buffer with JSONDecoder.raw_decode and yielded one at a time,
+    so memory is bounded by the largest element rather than the document.
+    Any other top-level value is buffered and handed to parse_json.
+    """
+    chunks = iter_text_chunks(source, chunk_size)
+    buf = ""
+    pos = 0
+    exhausted = False
+
+    def fill(min_growth: int = 1) -> None:
+        # Drop consumed text, then read until at least min_growth chars arrive.
+        nonlocal buf, pos, exhausted
+        parts = [buf[pos:]]
+        grown = 0
+        while grown < min_growth:
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+                break
+            parts.append(chunk)
+            grown += len(chunk)
+        buf = "".join(parts)
+        pos = 0
+
+    def skip_ws() -> None:
+        nonlocal pos
+        while True:
+            m = _WS_RE.match(buf, pos)
+            pos = m.end()
+            if pos < len(buf) or exhausted:
+                return
+            fill()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != "[":
+        yield from parse_json(buf[pos:] + "".join(chunks))
+        return
+    pos += 1
+    first = True
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise json.JSONDecodeError("Unterminated array", buf, pos)
+        if buf[pos] == "]":
+            pos += 1
+            skip_ws()
+            if pos < len(buf):
+                raise json.JSONDecodeError("Extra data", buf, pos)
+            return
+        if not first:
+            if buf[pos] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            pos += 1
+            skip_ws()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+                fill(len(buf) - pos)
+                continue
+            # A value cut off by the buffer edge can still decode ("12" of "123",
+            # "1.5" of "1.5e3"), so only accept it once the next "," or "]" is in view.
+            nxt = _WS_RE.match(buf, end).end()
+            if not exhausted and (nxt == len(buf) or buf[nxt] not in ",]"):
+                fill(len(buf) - pos)
+                continue
+            break
+        pos = nxt
+        first = False
+        yield obj
+
+
+def iter_ndjson(source: Any, *, chunk_size: int = CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """Yield one record per NDJSON line. Memory is bounded by the longest line.
+
+    Raises ParseError with the line number for invalid JSON or non-object lines.
+    """
+    for lineno, line in enumerate(iter_lines(source, chunk_size), 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ParseError(f"{e.msg} (column {e.colno})", line=lineno) from e
+        if not isinstance(rec, dict):
+            raise ParseError(f"expected a JSON object, got {type(rec).__name__}", line=lineno)
+        yield rec
+
+
+def infer_column_types(rows: list[list[str]], width: int) -> list[Callable[[str], Any] | None]:
+    """Pick int, float or None (keep str) per column from sample rows.
+
+    A column is numeric only if every non-empty sample value matches. Numbers with
+    leading zeros (zip codes, ids) stay strings.
+    """
+    converters: list[Callable[[str], Any] | None] = []
+    for col in range(width):
+        values = [row[col] for row in rows if col < len(row) and row[col] != ""]
+        if values and all(_INT_RE.fullmatch(v) for v in values):
+            converters.append(int)
+        elif values and all(_FLOAT_RE.fullmatch(v) for v in values):
+            converters.append(float)
+        else:
+            converters.append(None)
+    return converters
+
+
+def _convert(value: str, fn: Callable[[str], Any]) -> Any:
+    if value == "":
+        return value
+    try:
+        return fn(value)
+    except ValueError:
+        return value
+
+
+def iter_csv(
+    source: Any,
+    *,
+    chunk_size: int = CHUNK_SIZE,
+    infer_types: bool = False,
+    sample_size: int = SAMPLE_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """Yield CSV records one at a time. First row = headers. Keys lowercased.
+
+    source is read in chunk_size blocks and the lowercased header is computed
+    once. Rows follow csv.DictReader rules: blank rows are skipped, short rows
+    are padded with None and extra values go under the None key. With
+    infer_types=True the first sample_size rows decide each column's type
+    (int, float or str) and values are converted while parsing. Empty cells
+    and values that fail to convert are left as strings.
+    """
+    rows = csv.reader(iter_lines(source, chunk_size))
+    header = next(rows, None)
+    if header is None:
+        return
+    keys = [h.lower() for h in header]
+    width = len(keys)
+    converters: list[tuple[int, Callable[[str], Any]]] = []
+    if infer_types:
+        sample = list(islice(rows, sample_size))
+        converters = [(i, fn) for i, fn in enumerate(infer_column_types(sample, width)) if fn is not None]
+        rows = chain(sample, rows)
+    for row in rows:
+        if not row:
+            continue
+        if converters:
+            for i, fn in converters:
+                if i < len(row):
+                    row[i] = _convert(row[i], fn)
+        rec = dict(zip(keys, row))
+        if len(row) < width:
+            for key in keys[len(row):]:
+                rec.setdefault(key, None)
+        elif len(row) > width:
+            rec[None] = row[width:]
+        yield rec
@@ -2,45 +2,118 @@
 """CLI for ingestion pipeline: parse -> validate -> (optionally) save."""
 
 import argparse
+import json
 import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(ROOT))
 
-from ingestion import ingest
+from ingestion import ingest, ingest_checkpointed, ingest_file, ingest_stream
+from parsers import ParseError
 from storage import get_storage
+from validation import ValidationReportError
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Ingest JSON or CSV into storage")
+    parser = argparse.ArgumentParser(description="Ingest JSON, NDJSON or CSV into storage")
     parser.add_argument("input", nargs="?", default="-", help="Input file or - for stdin")
-    parser.add_argument("--format", choices=["json", "csv"], required=True)
+    parser.add_argument("--format", choices=["json", "ndjson", "csv"], required=True)
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map the input file and stream-parse it instead of reading it into memory")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Stream the input and run parse, validate and save as concurrent stages")
+    parser.add_argument("--queue-depth", type=int, default=4,
+                        help="Batches buffered between pipeline stages before the producer blocks")
+    parser.add_argument("--checkpoint-every", type=int, default=None,
+                        help="Commit to SQLite (rows schema) with a resume checkpoint every N records")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue a checkpointed ingest from its last committed checkpoint")
     parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory")
     parser.add_argument("--storage-path", type=str, default=None)
+    parser.add_argument("--sqlite-schema", choices=["blob", "rows"], default=None,
+                        help="SQLite layout: one JSON blob, or one row per record (migrates blob databases); "
+                             "default: the database's own layout, blob for a new one")
+    parser.add_argument("--sqlite-wal", action="store_true",
+                        help="Use WAL journaling with synchronous=normal so readers can load during the ingest")
     parser.add_argument("--dry-run", action="store_true", help="Parse and validate only, no writes")
     parser.add_argument("--skip-validation", action="store_true", help="Skip validation step")
     parser.add_argument("--normalize-keys", action="store_true", help="Lowercase all record keys")
+    parser.add_argument("--infer-types", action="store_true", help="Convert numeric CSV columns to int/float")
+    parser.add_argument("--required", type=str, default=None, help="Comma-separated required fields")
+    parser.add_argument("--min-count", type=int, default=None, help="Minimum allowed value of the count field")
+    parser.add_argument("--collect-errors", action="store_true",
+                        help="Validate every record and print a grouped error report instead of stopping at the first")
+    parser.add_argument("--max-error-indices", type=int, default=10,
+                        help="Record indices kept per error group in the report")
     args = parser.parse_args()
-
-    raw = Path(args.input).read_text() if args.input != "-" else sys.stdin.read()
+    if args.mmap and args.input == "-":
+        parser.error("--mmap needs an input file, not stdin")
+    checkpointed = args.resume or args.checkpoint_every is not None
+    if checkpointed:
+        if args.input == "-" or args.dry_run or args.storage != "sqlite" or args.sqlite_schema == "blob":
+            parser.error("--checkpoint-every/--resume need an input file, --storage sqlite and the rows schema")
+        args.sqlite_schema = "rows"
+        if args.infer_types or args.collect_errors or args.pipeline or args.mmap:
+            parser.error("--checkpoint-every/--resume cannot be combined with "
+                         "--infer-types, --collect-errors, --pipeline or --mmap")
 
     storage = None
     if not args.dry_run:
         path = args.storage_path or str(ROOT / "data" / "ingested.db")
+        options = {}
         if args.storage == "sqlite":
             Path(path).parent.mkdir(parents=True, exist_ok=True)
-        storage = get_storage(args.storage, path=path)
+            options["schema"] = args.sqlite_schema
+            if args.sqlite_wal:
+                options.update(journal_mode="wal", synchronous="normal")
+        storage = get_storage(args.storage, path=path, **options)
 
-    records = ingest(
-        raw,
-        args.format,
+    options = dict(
         storage=storage,
         dry_run=args.dry_run,
         skip_validation=args.skip_validation,
         normalize_keys=args.normalize_keys,
+        infer_types=args.infer_types,
+        required=args.required.split(",") if args.required else None,
+        min_count=args.min_count,
+        collect_errors=args.collect_errors,
+        max_error_indices=args.max_error_indices,
     )
-    print(f"ingested {len(records)} records", file=sys.stderr)
+    if args.pipeline:
+        options.update(pipelined=True, queue_depth=args.queue_depth)
+    try:
+        if checkpointed:
+            summary = ingest_checkpointed(
+                args.input, args.format, storage,
+                checkpoint_every=args.checkpoint_every or 10_000,
+                resume=args.resume,
+                skip_validation=args.skip_validation,
+                normalize_keys=args.normalize_keys,
+                required=options["required"],
+                min_count=args.min_count,
+            )
+            count = summary["record_count"]
+            if summary["resumed_from"]:
+                print(f"resumed after {summary['resumed_from']} committed records", file=sys.stderr)
+        elif args.mmap:
+            count = ingest_file(args.input, args.format, use_mmap=True, **options)["record_count"]
+        elif args.format == "ndjson" or args.pipeline:
+            # NDJSON (and any --pipeline run) streams straight from the file; memory stays flat.
+            if args.input == "-":
+                count = ingest_stream(sys.stdin.buffer, args.format, **options)["record_count"]
+            else:
+                count = ingest_file(args.input, args.format, **options)["record_count"]
+        else:
+            raw = Path(args.input).read_text() if args.input != "-" else sys.stdin.read()
+            count = len(ingest(raw, args.format, **options))
+    except ValidationReportError as e:
+        print(json.dumps(e.report.to_dict(), indent=2), file=sys.stderr)
+        sys.exit(1)
+    except ParseError as e:
+        print(f"parse error: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"ingested {count} records", file=sys.stderr)
     if args.dry_run:
         print("(dry-run: nothing written)", file=sys.stderr)
 
@@ -1,11 +1,64 @@
 """Storage backends with a common interface."""
 
+import asyncio
 import json
 import sqlite3
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
 from typing import Any
 
+try:
+    import trace as _trace
+except ImportError:
+    _trace = None
+
+_spanned = _trace.spanned if _trace else lambda *args, **kwargs: lambda fn: fn
+
+
+def _key_value(value: Any) -> str:
+    """Canonical text form of an upsert key value (also the SQLite key column)."""
+    return json.dumps(value, sort_keys=True)
+
+
+def _check_page(offset: int, limit: int | None) -> None:
+    if offset < 0 or (limit is not None and limit < 0):
+        raise ValueError(f"offset and limit must be >= 0, got offset={offset}, limit={limit}")
+
+
+def _build_key_index(records: list[dict[str, Any]], key: str) -> dict[str, int]:
+    return {_key_value(rec[key]): pos for pos, rec in enumerate(records) if key in rec}
+
+
+def _upsert_into(
+    target: list[dict[str, Any]],
+    index: dict[str, int],
+    records: Iterable[dict[str, Any]],
+    key: str,
+) -> int:
+    """Replace records whose key is in index, append the rest. Returns count written.
+
+    Every record is keyed before target or index changes, so a missing or
+    unserializable key leaves both untouched.
+    """
+    staged = []
+    for rec in records:
+        if key not in rec:
+            raise ValueError(f"record missing upsert key: {key}")
+        staged.append((_key_value(rec[key]), rec))
+    for k, rec in staged:
+        pos = index.get(k)
+        if pos is None:
+            index[k] = len(target)
+            target.append(rec)
+        else:
+            target[pos] = rec
+    return len(staged)
+
 
 class Storage(ABC):
     """Common interface: save and load records."""
@@ -16,60 +69,503 @@ class Storage(ABC):
         ...
 
     @abstractmethod
-    def load(self) -> list[dict[str, Any]]:
-        """Load records. Returns [] if empty."""
+    def load(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        """Load records, optionally a page of them. Returns [] if empty."""
         ...
 
+    def iter_records(self, batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+        """Yield records in order, fetching batch_size at a time where the backend can.
+
+        Default pages through load(offset, limit).
+        """
+        offset = 0
+        while True:
+            page = self.load(offset, batch_size)
+            yield from page
+            if len(page) < batch_size:
+                return
+            offset += len(page)
+
+    def save_iter(self, records: Iterable[dict[str, Any]]) -> int:
+        """Persist records from an iterable, replacing existing ones. Returns count.
+
+        Default materializes the iterable and calls save(); backends that can
+        write incrementally override this.
+        """
+        records = list(records)
+        self.save(records)
+        return len(records)
+
+    def append(self, records: Iterable[dict[str, Any]]) -> int:
+        """Add records after the existing ones. Returns count appended.
+
+        Default rewrites the whole store via load() + save().
+        """
+        existing = self.load()
+        added = list(records)
+        self.save(existing + added)
+        return len(added)
+
+    def upsert(self, records: Iterable[dict[str, Any]], key: str) -> int:
+        """Replace records with a matching value for field `key`, append the rest.
+        Raises ValueError if a record lacks the key. Returns count written.
+
+        Default rewrites the whole store via load() + save().
+        """
+        existing = self.load()
+        n = _upsert_into(existing, _build_key_index(existing, key), records, key)
+        self.save(existing)
+        return n
+
+    def close(self) -> None:
+        """Release held resources. No-op unless the backend keeps connections open."""
+
+    def __enter__(self) -> "Storage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
 
 class MemoryStorage(Storage):
     """In-memory storage."""
 
     def __init__(self) -> None:
         self._records: list[dict[str, Any]] = []
+        # key field -> {canonical key value: position}; built on first upsert by that key.
+        self._key_index: dict[str, dict[str, int]] = {}
 
+    @_spanned(source="storage.{cls}")
     def save(self, records: list[dict[str, Any]]) -> None:
         self._records = list(records)
+        self._key_index = {}
+
+    @_spanned(source="storage.{cls}")
+    def load(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        _check_page(offset, limit)
+        if limit is None:
+            return self._records[offset:]
+        return self._records[offset:offset + limit]
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+        """Iterate the live list directly; no copy is made."""
+        return iter(self._records)
 
-    def load(self) -> list[dict[str, Any]]:
-        return list(self._records)
+    def save_iter(self, records: Iterable[dict[str, Any]]) -> int:
+        collected = list(records)
+        self._records = collected
+        self._key_index = {}
+        return len(collected)
+
+    def append(self, records: Iterable[dict[str, Any]]) -> int:
+        # Stage everything first, so an iterable that raises partway changes nothing.
+        added = list(records)
+        start = len(self._records)
+        updates = {
+            key: [(_key_value(rec[key]), start + i) for i, rec in enumerate(added) if key in rec]
+            for key in self._key_index
+        }
+        self._records.extend(added)
+        for key, entries in updates.items():
+            self._key_index[key].update(entries)
+        return len(added)
+
+    def upsert(self, records: Iterable[dict[str, Any]], key: str) -> int:
+        index = self._key_index.get(key)
+        if index is None:
+            index = _build_key_index(self._records, key)
+        n = _upsert_into(self._records, index, records, key)
+        # Replacing records by one key field invalidates the indexes of the others.
+        self._key_index = {key: index}
+        return n
 
 
 class SQLiteStorage(Storage):
-    """SQLite-backed persistent storage."""
+    """SQLite-backed persistent storage.
+
+    schema="blob" keeps the whole record list as one JSON row in `records`.
+    schema="rows" stores one JSON row per record in `record_rows`, written
+    with batched executemany inside a single transaction. The layout is
+    recorded in storage_meta: schema=None (default) opens a database in its
+    recorded layout, and a new one as blob. Opening a blob database with
+    schema="rows" migrates it in place; opening a rows database with
+    schema="blob" raises ValueError rather than reading it as empty.
+
+    In rows mode append() is a plain insert, and upsert() goes through a
+    UNIQUE index on the `key` column, so a delta costs one write per record.
+    The first upsert fixes the key field for the database (kept in
+    storage_meta) and backfills the column for existing rows; other key
+    fields are rejected until save()/save_iter() replaces the dataset, which
+    drops the key. Appending a record whose key value is already stored
+    keeps both; the newest one then holds the key, so a later upsert
+    replaces it, as in MemoryStorage and the base class.
+
+    By default every call opens and closes its own connection. persistent=True
+    keeps one long-lived connection per thread until close() (or the end of a
+    `with` block). journal_mode="wal" lets readers in other processes load
+    while a writer is active; synchronous, cache_size and mmap_size are
+    applied as PRAGMAs on every connection.
+    """
 
-    def __init__(self, path: str | Path) -> None:
+    SCHEMAS = ("blob", "rows")
+    JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+    SYNCHRONOUS = ("off", "normal", "full", "extra")
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        schema: str | None = None,
+        batch_size: int = 1000,
+        persistent: bool = False,
+        journal_mode: str | None = None,
+        synchronous: str | None = None,
+        cache_size: int | None = None,
+        mmap_size: int | None = None,
+    ) -> None:
+        if schema is not None and schema not in self.SCHEMAS:
+            raise ValueError(f"unknown sqlite schema: {schema}")
+        if journal_mode is not None and journal_mode.lower() not in self.JOURNAL_MODES:
+            raise ValueError(f"unknown journal_mode: {journal_mode}")
+        if synchronous is not None and synchronous.lower() not in self.SYNCHRONOUS:
+            raise ValueError(f"unknown synchronous: {synchronous}")
         self._path = Path(path)
         self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._schema = schema
+        self._batch_size = batch_size
+        self._persistent = persistent
+        self._pragmas = []
+        if journal_mode is not None:
+            self._pragmas.append(f"PRAGMA journal_mode = {journal_mode.lower()}")
+        if synchronous is not None:
+            self._pragmas.append(f"PRAGMA synchronous = {synchronous.lower()}")
+        if cache_size is not None:
+            self._pragmas.append(f"PRAGMA cache_size = {int(cache_size)}")
+        if mmap_size is not None:
+            self._pragmas.append(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self._local = threading.local()
+        self._conns: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._upsert_key: str | None = None
         self._init_db()
 
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._path, check_same_thread=not self._persistent)
+        for pragma in self._pragmas:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Yield a connection inside a transaction (commit on success, rollback on error)."""
+        if not self._persistent:
+            conn = self._open()
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+            return
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            with self._lock:
+                self._conns.append(conn)
+        with conn:
+            yield conn
+
+    def close(self) -> None:
+        """Close every persistent connection. The store reopens lazily if used again."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
     def _init_db(self) -> None:
-        with sqlite3.connect(self._path) as conn:
+        with self._connect() as conn:
             conn.execute(
                 "CREATE TABLE IF NOT EXISTS records (data TEXT)"
             )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS storage_meta (name TEXT PRIMARY KEY, value TEXT)"
+            )
+            stored = self._stored_schema(conn)
+            if self._schema is None:
+                self._schema = stored or "blob"
+            elif self._schema == "blob" and stored == "rows":
+                raise ValueError(f"{self._path} holds schema='rows' data; open it with schema='rows' or None")
+            if stored != self._schema:
+                conn.execute("INSERT OR REPLACE INTO storage_meta (name, value) VALUES ('schema', ?)", (self._schema,))
+            if self._schema == "rows":
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS record_rows (id INTEGER PRIMARY KEY, data TEXT NOT NULL, key TEXT)"
+                )
+                columns = [r[1] for r in conn.execute("PRAGMA table_info(record_rows)")]
+                if "key" not in columns:
+                    conn.execute("ALTER TABLE record_rows ADD COLUMN key TEXT")
+                row = conn.execute("SELECT value FROM storage_meta WHERE name = 'upsert_key'").fetchone()
+                self._upsert_key = row[0] if row else None
+                self._migrate_blob(conn)
+
+    @staticmethod
+    def _stored_schema(conn: sqlite3.Connection) -> str | None:
+        """Layout recorded in storage_meta; for databases from before it was recorded,
+        "rows" if record_rows has data, "blob" if records has, else None."""
+        row = conn.execute("SELECT value FROM storage_meta WHERE name = 'schema'").fetchone()
+        if row:
+            return row[0]
+        has_rows_table = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'record_rows'"
+        ).fetchone()
+        if has_rows_table and conn.execute("SELECT 1 FROM record_rows LIMIT 1").fetchone():
+            return "rows"
+        if conn.execute("SELECT 1 FROM records LIMIT 1").fetchone():
+            return "blob"
+        return None
+
+    def _migrate_blob(self, conn: sqlite3.Connection) -> None:
+        """Move a legacy single-blob payload into record_rows, then drop the blob."""
+        row = conn.execute("SELECT data FROM records LIMIT 1").fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM record_rows")
+        self._insert_rows(conn, json.loads(row[0]))
+        conn.execute("DELETE FROM records")
 
+    def _row_key(self, rec: dict[str, Any]) -> str | None:
+        key = self._upsert_key
+        if key is None or key not in rec:
+            return None
+        return _key_value(rec[key])
+
+    def _insert_rows(self, conn: sqlite3.Connection, records: Iterable[dict[str, Any]]) -> int:
+        it = iter(records)
+        count = 0
+        while True:
+            batch = [(json.dumps(r), self._row_key(r)) for r in islice(it, self._batch_size)]
+            if not batch:
+                return count
+            if self._upsert_key is not None:
+                # The newest record with a key value holds it (see the class docstring).
+                last = {k: i for i, (_, k) in enumerate(batch) if k is not None}
+                batch = [(data, k if last.get(k) == i else None) for i, (data, k) in enumerate(batch)]
+                conn.executemany("UPDATE record_rows SET key = NULL WHERE key = ?", [(k,) for k in last])
+            conn.executemany("INSERT INTO record_rows (data, key) VALUES (?, ?)", batch)
+            count += len(batch)
+
+    def _set_upsert_key(self, conn: sqlite3.Connection, key: str) -> None:
+        """Backfill the key column for existing rows and add the UNIQUE index."""
+        updates = []
+        for row_id, data in conn.execute("SELECT id, data FROM record_rows"):
+            rec = json.loads(data)
+            if key in rec:
+                updates.append((_key_value(rec[key]), row_id))
+        conn.executemany("UPDATE record_rows SET key = ? WHERE id = ?", updates)
+        conn.execute("INSERT OR REPLACE INTO storage_meta (name, value) VALUES ('upsert_key', ?)", (key,))
+        try:
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS record_rows_key ON record_rows (key)")
+        except sqlite3.IntegrityError:
+            raise ValueError(f"existing records have duplicate values for upsert key: {key}")
+
+    @_spanned(source="storage.{cls}")
     def save(self, records: list[dict[str, Any]]) -> None:
-        with sqlite3.connect(self._path) as conn:
+        if self._schema == "rows":
+            self.save_iter(records)
+            return
+        with self._connect() as conn:
             conn.execute("DELETE FROM records")
             conn.execute(
                 "INSERT INTO records (data) VALUES (?)",
                 (json.dumps(records),)
             )
 
-    def load(self) -> list[dict[str, Any]]:
-        with sqlite3.connect(self._path) as conn:
+    def save_iter(self, records: Iterable[dict[str, Any]]) -> int:
+        if self._schema != "rows":
+            return super().save_iter(records)
+        with self._connect() as conn:
+            conn.execute("DELETE FROM record_rows")
+            conn.execute("DELETE FROM storage_meta WHERE name IN ('ingest_checkpoint', 'upsert_key')")
+            conn.execute("DROP INDEX IF EXISTS record_rows_key")
+            key, self._upsert_key = self._upsert_key, None
+            try:
+                return self._insert_rows(conn, records)
+            except BaseException:
+                self._upsert_key = key  # rolled back with the transaction
+                raise
+
+    def append(self, records: Iterable[dict[str, Any]]) -> int:
+        if self._schema != "rows":
+            return super().append(records)
+        with self._connect() as conn:
+            return self._insert_rows(conn, records)
+
+    def append_checkpointed(self, records: Iterable[dict[str, Any]], checkpoint: dict[str, Any]) -> int:
+        """Append records and store checkpoint in the same transaction (rows schema only).
+
+        After a crash the stored checkpoint therefore describes exactly the
+        records on disk. save()/save_iter() clear it. Returns count appended.
+        """
+        if self._schema != "rows":
+            raise ValueError("checkpoints need schema='rows'")
+        with self._connect() as conn:
+            n = self._insert_rows(conn, records)
+            conn.execute(
+                "INSERT OR REPLACE INTO storage_meta (name, value) VALUES ('ingest_checkpoint', ?)",
+                (json.dumps(checkpoint),),
+            )
+            return n
+
+    def checkpoint(self) -> dict[str, Any] | None:
+        """Last checkpoint stored by append_checkpointed, or None."""
+        if self._schema != "rows":
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM storage_meta WHERE name = 'ingest_checkpoint'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, records: Iterable[dict[str, Any]], key: str) -> int:
+        if self._schema != "rows":
+            return super().upsert(records, key)
+        if self._upsert_key is not None and self._upsert_key != key:
+            raise ValueError(f"store is keyed by {self._upsert_key!r}, not {key!r}")
+        with self._connect() as conn:
+            if self._upsert_key is None:
+                self._set_upsert_key(conn, key)
+            it = iter(records)
+            count = 0
+            while True:
+                batch = []
+                for rec in islice(it, self._batch_size):
+                    if key not in rec:
+                        raise ValueError(f"record missing upsert key: {key}")
+                    batch.append((json.dumps(rec), _key_value(rec[key])))
+                if not batch:
+                    break
+                conn.executemany(
+                    "INSERT INTO record_rows (data, key) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET data = excluded.data",
+                    batch,
+                )
+                count += len(batch)
+        self._upsert_key = key
+        return count
+
+    @_spanned(source="storage.{cls}")
+    def load(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        _check_page(offset, limit)
+        if self._schema == "rows":
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT data FROM record_rows ORDER BY id LIMIT ? OFFSET ?",
+                    (-1 if limit is None else limit, offset),
+                ).fetchall()
+            return [json.loads(data) for (data,) in rows]
+        with self._connect() as conn:
             row = conn.execute("SELECT data FROM records LIMIT 1").fetchone()
         if row is None:
             return []
-        return json.loads(row[0])
+        records = json.loads(row[0])
+        if offset or limit is not None:
+            return records[offset:None if limit is None else offset + limit]
+        return records
+
+    def iter_records(self, batch_size: int = 1000) -> Iterator[dict[str, Any]]:
+        """Rows mode: keyset scan on id, one query per batch. Blob mode decodes the blob once."""
+        if self._schema != "rows":
+            yield from self.load()
+            return
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, data FROM record_rows WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            for _, data in rows:
+                yield json.loads(data)
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
 
 
-def get_storage(backend: str, path: str | Path | None = None) -> Storage:
-    """Get storage by config. backend='memory' or 'sqlite'."""
+def get_storage(backend: str, path: str | Path | None = None, **options: Any) -> Storage:
+    """Get storage by config. backend='memory' or 'sqlite'. options go to SQLiteStorage."""
     if backend == "memory":
         return MemoryStorage()
     if backend == "sqlite":
         if path is None:
             raise ValueError("sqlite backend requires path")
-        return SQLiteStorage(path)
+        return SQLiteStorage(path, **options)
     raise ValueError(f"unknown backend: {backend}")
+
+
+class AsyncStorage(ABC):
+    """Async counterpart of Storage for use inside an event loop."""
+
+    @abstractmethod
+    async def save(self, records: list[dict[str, Any]]) -> None:
+        """Persist records."""
+        ...
+
+    @abstractmethod
+    async def load(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        """Load records, optionally a page of them. Returns [] if empty."""
+        ...
+
+    async def append(self, records: Iterable[dict[str, Any]]) -> int:
+        """Add records after the existing ones. Returns count appended."""
+        records = list(records)
+        existing = await self.load()
+        await self.save(existing + records)
+        return len(records)
+
+    async def close(self) -> None:
+        """Release held resources."""
+
+    async def __aenter__(self) -> "AsyncStorage":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+
+class ThreadedStorage(AsyncStorage):
+    """Runs a synchronous Storage on its own single worker thread.
+
+    Every call is queued to one dedicated executor thread, so blocking sqlite3
+    I/O never runs on the event loop and calls reach the backend one at a time
+    in submission order (safe for SQLiteStorage, including persistent=True).
+    close() closes the wrapped storage, then stops the thread.
+    """
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage-io")
+
+    async def _call(self, fn: Any, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def save(self, records: list[dict[str, Any]]) -> None:
+        await self._call(self.storage.save, records)
+
+    async def load(self, offset: int = 0, limit: int | None = None) -> list[dict[str, Any]]:
+        return await self._call(self.storage.load, offset, limit)
+
+    async def append(self, records: Iterable[dict[str, Any]]) -> int:
+        return await self._call(self.storage.append, list(records))
+
+    async def upsert(self, records: Iterable[dict[str, Any]], key: str) -> int:
+        """See Storage.upsert."""
+        return await self._call(self.storage.upsert, list(records), key)
+
+    async def close(self) -> None:
+        try:
+            await self._call(self.storage.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+
+def get_async_storage(backend: str, path: str | Path | None = None, **options: Any) -> AsyncStorage:
+    """get_storage wrapped in a ThreadedStorage. Same arguments."""
+    return ThreadedStorage(get_storage(backend, path, **options))
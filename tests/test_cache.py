@@ -0,0 +1,83 @@
+"""Tests for the ingest result cache."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+import ingestion
+from cache import IngestCache
+from ingestion import disable_cache, enable_cache, ingest
+from storage import MemoryStorage
+from validation import SemanticError
+
+
+@pytest.fixture
+def cache_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield Path(d)
+    disable_cache()
+
+
+def test_roundtrip_and_key_sensitivity(cache_dir):
+    cache = IngestCache(cache_dir)
+    records = [{"a": 1, "b": [1.5, None, True]}, {None: ["x"], "c": "é"}]
+    key = cache.key("raw", "json", {"normalize_keys": True, "types": {"count": int}})
+    assert cache.get(key) is None
+    cache.put(key, records)
+    assert cache.get(key) == records
+    assert cache.key(b"raw", "json", {"types": {"count": int}, "normalize_keys": True}) == key
+    assert cache.key("raw", "csv", {"normalize_keys": True, "types": {"count": int}}) != key
+    assert cache.key("raw", "json", {"normalize_keys": False, "types": {"count": int}}) != key
+    assert cache.key("raw2", "json", {"normalize_keys": True, "types": {"count": int}}) != key
+
+
+def test_corrupt_entry_is_a_miss(cache_dir):
+    cache = IngestCache(cache_dir)
+    cache.put("k", [{"a": 1}])
+    (cache_dir / "k.rec").write_bytes(b"not zlib")
+    assert cache.get("k") is None
+    assert not (cache_dir / "k.rec").exists()
+
+
+def test_evicts_least_recently_used(cache_dir):
+    cache = IngestCache(cache_dir, max_bytes=10**9)
+    payload = [{"v": os.urandom(4000).hex()}]
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, payload)
+        os.utime(cache_dir / f"{key}.rec", ns=(i * 10**9, i * 10**9))
+    assert cache.get("a") == payload  # a becomes most recently used
+    cache.max_bytes = 2 * (cache_dir / "a.rec").stat().st_size
+    assert cache.evict() == 1
+    assert cache.get("b") is None
+    assert cache.get("a") == payload and cache.get("c") == payload
+
+
+def test_ingest_uses_cache_when_enabled(cache_dir, monkeypatch):
+    raw = '[{"Name": "a", "count": 1}]'
+    enable_cache(cache_dir)
+    first = ingest(raw, "json", normalize_keys=True)
+
+    def no_parse(raw):
+        raise RuntimeError("parsed despite cache hit")
+
+    monkeypatch.setattr(ingestion, "parse_json", no_parse)
+    store = MemoryStorage()
+    assert ingest(raw, "json", storage=store, normalize_keys=True) == first == [{"name": "a", "count": 1}]
+    assert store.load() == first
+    with pytest.raises(RuntimeError):
+        ingest(raw, "json", normalize_keys=False)  # different options miss the cache
+    disable_cache()
+    with pytest.raises(RuntimeError):
+        ingest(raw, "json", normalize_keys=True)
+
+
+def test_ingest_does_not_cache_failures(cache_dir):
+    enable_cache(cache_dir)
+    with pytest.raises(SemanticError):
+        ingest('[{"count": -1}]', "json", min_count=0)
+    assert not list(cache_dir.glob("*.rec"))
@@ -0,0 +1,315 @@
+"""Tests for the streaming, checkpointed, parallel and async ingestion paths.
+
+Kept apart from test_ingestion.py, which imports the removed
+normalize_keys_for_ingestion helper and so fails to collect.
+"""
+
+import asyncio
+import io
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+import trace
+from ingestion import (
+    aingest,
+    ingest_checkpointed,
+    ingest,
+    ingest_file,
+    ingest_stream,
+    parallel_ingest,
+)
+from parsers import ParseError
+from storage import MemoryStorage, SQLiteStorage, ThreadedStorage
+from validation import SemanticError, ValidationReportError
+
+
+def test_ingest_trace_has_stage_spans():
+    run_dir = Path(tempfile.mkdtemp())
+    trace.init(run_dir)
+    ingest('[{"Name": "a", "count": 1}]', "json", storage=MemoryStorage(), normalize_keys=True, min_count=0)
+    trace.close()
+    events = [json.loads(line) for line in (run_dir / "trace.jsonl").read_text().splitlines()]
+    spans = {e["name"]: e for e in events if e["event"] == "span"}
+    assert set(spans) == {"ingest", "parse", "normalize", "validate", "save"}
+    root = spans["ingest"]["span_id"]
+    assert all(spans[name]["parent_id"] == root for name in ("parse", "normalize", "validate", "save"))
+    assert spans["save"]["source"] == "storage.MemoryStorage"
+
+
+def test_ingest_stream_csv_chunks_to_memory():
+    store = MemoryStorage()
+    chunks = [b"name,count\nx,", b"3\ny,5\n"]
+    summary = ingest_stream(chunks, "csv", storage=store)
+    assert summary == {"format": "csv", "record_count": 2, "saved": True}
+    assert store.load() == [{"name": "x", "count": "3"}, {"name": "y", "count": "5"}]
+
+
+def test_ingest_stream_file_object_matches_ingest():
+    raw = '[{"Name": "a", "count": 1}, {"Name": "b", "count": 2}]'
+    store = MemoryStorage()
+    summary = ingest_stream(io.BytesIO(raw.encode()), "json", storage=store, normalize_keys=True)
+    assert summary["record_count"] == 2
+    assert store.load() == ingest(raw, "json", normalize_keys=True)
+
+
+def test_ingest_stream_validation_error_saves_nothing():
+    store = MemoryStorage()
+    store.save([{"name": "old"}])
+    raw = "name,count\nx,3\ny,-1\n"
+    with pytest.raises(SemanticError) as exc:
+        ingest_stream(raw, "csv", storage=store, min_count=0)
+    assert exc.value.index == 1
+    assert store.load() == [{"name": "old"}]
+
+
+def test_ingest_collect_errors_reports_all_and_saves_nothing():
+    store = MemoryStorage()
+    raw = "name,count\nx,-1\ny,2\nz,-3\n"
+    with pytest.raises(ValidationReportError) as exc:
+        ingest(raw, "csv", storage=store, min_count=0, collect_errors=True)
+    assert exc.value.index == 0
+    assert exc.value.report.to_dict()["groups"][0]["first_indices"] == [0, 2]
+    assert store.load() == []
+
+
+def test_ingest_stream_collect_errors_rolls_back():
+    store = MemoryStorage()
+    store.save([{"name": "old"}])
+    raw = '[{"name": "a"}, {"other": 1}, {"name": ""}]'
+    with pytest.raises(ValidationReportError) as exc:
+        ingest_stream(raw, "json", storage=store, required=["name"], collect_errors=True)
+    report = exc.value.report
+    assert report.records_checked == 3
+    assert report.failed_records == 2
+    assert store.load() == [{"name": "old"}]
+
+
+def test_ingest_stream_pipelined_matches_serial():
+    raw = "".join(f'{{"Name": "r{i}", "count": {i}}}\n' for i in range(250))
+    with tempfile.TemporaryDirectory() as d:
+        store = SQLiteStorage(Path(d) / "db.sqlite", schema="rows")
+        summary = ingest_stream(raw, "ndjson", storage=store, normalize_keys=True, min_count=0,
+                                pipelined=True, queue_depth=2, batch_size=16)
+        assert summary["record_count"] == 250
+        assert store.load() == ingest(raw, "ndjson", normalize_keys=True)
+
+
+def test_ingest_stream_pipelined_error_rolls_back_and_stops_threads():
+    store = MemoryStorage()
+    store.save([{"name": "old"}])
+    raw = "name,count\n" + "x,1\n" * 100 + "y,-1\n" + "z,1\n" * 1000
+    with pytest.raises(SemanticError) as exc:
+        ingest_stream(raw, "csv", storage=store, min_count=0, pipelined=True, batch_size=8)
+    assert exc.value.index == 100
+    assert store.load() == [{"name": "old"}]
+    assert not [t for t in threading.enumerate() if t.name.startswith("ingest-")]
+
+
+def test_ingest_stream_pipelined_applies_backpressure():
+    produced = 0
+
+    def source():
+        nonlocal produced
+        for i in range(500):
+            produced += 1
+            yield f'{{"n": {i}}}\n'.encode()
+
+    class SlowStorage(MemoryStorage):
+        max_lead = 0
+
+        def save_iter(self, records):
+            seen = 0
+            for _ in records:
+                seen += 1
+                self.max_lead = max(self.max_lead, produced - seen)
+                time.sleep(0.0005)
+            return seen
+
+    store = SlowStorage()
+    ingest_stream(source(), "ndjson", storage=store, required=["n"], pipelined=True, queue_depth=2, batch_size=5)
+    # Each of the two stages buffers at most depth queued batches plus one in hand.
+    assert store.max_lead <= 2 * (2 + 2) * 5 + 1
+
+
+def test_ingest_csv_infer_types_matches_json():
+    csv_records = ingest("Name,count\na,1\nb,2", "csv", normalize_keys=True, infer_types=True)
+    json_records = ingest('[{"Name": "a", "count": 1}, {"Name": "b", "count": 2}]', "json", normalize_keys=True)
+    assert csv_records == json_records
+
+
+def test_ingest_ndjson_matches_json():
+    store = MemoryStorage()
+    raw = '{"name": "x", "count": 3}\n{"name": "y", "count": 5}\n'
+    records = ingest(raw, "ndjson", storage=store)
+    assert records == ingest('[{"name": "x", "count": 3}, {"name": "y", "count": 5}]', "json")
+    summary = ingest_stream(io.BytesIO(raw.encode()), "ndjson", storage=store, min_count=0)
+    assert summary["record_count"] == 2
+
+
+def test_ingest_file_mmap_matches_ingest(tmp_path):
+    raw = '[{"Name": "a", "count": 1}, {"Name": "b", "count": 2}]'
+    path = tmp_path / "in.json"
+    path.write_text(raw)
+    for use_mmap in (False, True):
+        store = MemoryStorage()
+        summary = ingest_file(path, "json", storage=store, use_mmap=use_mmap, normalize_keys=True)
+        assert summary["record_count"] == 2
+        assert store.load() == ingest(raw, "json", normalize_keys=True)
+
+
+def test_parallel_ingest_csv_matches_serial(tmp_path):
+    raw = "Name,count\n" + "".join(f"n{i},{i}\n" for i in range(500))
+    path = tmp_path / "in.csv"
+    path.write_text(raw)
+    store = MemoryStorage()
+    summary = parallel_ingest(path, "csv", storage=store, workers=3, normalize_keys=True, min_count=0)
+    assert summary["record_count"] == 500
+    assert store.load() == ingest(raw, "csv", normalize_keys=True)
+
+
+def test_parallel_ingest_streams_many_small_shards_in_order(tmp_path):
+    raw = "".join(f'{{"n": {i}}}\n' for i in range(400))
+    path = tmp_path / "in.ndjson"
+    path.write_text(raw)
+    store = MemoryStorage()
+    summary = parallel_ingest(path, "ndjson", storage=store, workers=2, shard_bytes=256)
+    assert summary["shards"] > 2 * 2
+    assert store.load() == [{"n": i} for i in range(400)]
+
+
+def test_parallel_ingest_remaps_error_positions(tmp_path):
+    path = tmp_path / "in.ndjson"
+    path.write_text("".join(f'{{"count": {i}}}\n' for i in range(300)) + '{"count": -1}\n{oops\n')
+    store = MemoryStorage()
+    with pytest.raises(SemanticError) as exc:
+        parallel_ingest(path, "ndjson", storage=store, workers=3, min_count=0)
+    assert exc.value.index == 300
+    assert store.load() == []
+    with pytest.raises(ParseError) as perr:
+        parallel_ingest(path, "ndjson", workers=3)
+    assert perr.value.line == 302
+
+
+def test_aingest_matches_ingest_and_saves():
+    raw = "Name,count\na,1\nb,2\n"
+    store = ThreadedStorage(MemoryStorage())
+
+    async def run():
+        records = await aingest(raw, "csv", storage=store, normalize_keys=True, infer_types=True, min_count=0)
+        return records, await store.load()
+
+    records, saved = asyncio.run(run())
+    assert records == saved == ingest(raw, "csv", normalize_keys=True, infer_types=True)
+
+
+def test_aingest_validation_error_saves_nothing():
+    store = ThreadedStorage(MemoryStorage())
+    with pytest.raises(SemanticError) as exc:
+        asyncio.run(aingest('[{"count": 1}, {"count": -1}]', "json", storage=store, min_count=0))
+    assert exc.value.index == 1
+    assert store.storage.load() == []
+
+
+def test_aingest_yields_to_other_tasks():
+    raw = "".join(f'{{"n": {i}}}\n' for i in range(5000))
+    ticks = 0
+
+    async def ticker(done):
+        nonlocal ticks
+        while not done.is_set():
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def run():
+        done = asyncio.Event()
+        task = asyncio.create_task(ticker(done))
+        await asyncio.sleep(0)
+        start = ticks
+        await aingest(raw, "ndjson", required=["n"], yield_every=100)
+        done.set()
+        await task
+        return ticks - start
+
+    # Parse and validate each yield every 100 of the 5000 records.
+    assert asyncio.run(run()) >= 50
+
+
+def _write_records(path, format, counts):
+    if format == "ndjson":
+        path.write_text("".join(f'{{"id": {i}, "count": {c}}}\n' for i, c in enumerate(counts)))
+    elif format == "csv":
+        path.write_text("id,count\n" + "".join(f"{i},{c}\n" for i, c in enumerate(counts)))
+    else:
+        path.write_text(json.dumps([{"id": i, "count": c} for i, c in enumerate(counts)]))
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv", "json"])
+def test_ingest_checkpointed_resumes_after_failure(format):
+    with tempfile.TemporaryDirectory() as d:
+        src = Path(d) / f"in.{format}"
+        store = SQLiteStorage(Path(d) / "db.sqlite", schema="rows")
+        counts = [1] * 30
+        counts[25] = -1
+        _write_records(src, format, counts)
+        with pytest.raises(SemanticError) as exc:
+            ingest_checkpointed(src, format, store, checkpoint_every=10, min_count=0)
+        assert exc.value.index == 25
+        assert len(store.load()) == 20
+        assert store.checkpoint()["records"] == 20
+
+        counts[25] = 2  # same width, so committed offsets stay valid
+        _write_records(src, format, counts)
+        summary = ingest_checkpointed(src, format, store, checkpoint_every=10, resume=True, min_count=0)
+        assert summary["resumed_from"] == 20
+        assert summary["record_count"] == 30
+        expected = ingest(src.read_text(), format)
+        assert store.load() == expected
+        assert store.checkpoint()["done"] is True
+        # A finished ingest resumes to a no-op.
+        assert ingest_checkpointed(src, format, store, resume=True)["record_count"] == 30
+        assert len(store.load()) == 30
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv", "json"])
+def test_ingest_checkpointed_rejects_input_changed_before_checkpoint(format):
+    with tempfile.TemporaryDirectory() as d:
+        src = Path(d) / f"in.{format}"
+        store = SQLiteStorage(Path(d) / "db.sqlite", schema="rows")
+        counts = [1] * 30
+        counts[25] = -1
+        _write_records(src, format, counts)
+        with pytest.raises(SemanticError):
+            ingest_checkpointed(src, format, store, checkpoint_every=10, min_count=0)
+        counts[5] = 7  # inside the committed prefix, same width
+        _write_records(src, format, counts)
+        with pytest.raises(ValueError):
+            ingest_checkpointed(src, format, store, resume=True, min_count=0)
+        src.write_text(src.read_text()[1:] if format != "json" else "[]")
+        with pytest.raises(ValueError):
+            ingest_checkpointed(src, format, store, resume=True, min_count=0)
+        assert len(store.load()) == 20
+
+
+def test_ingest_checkpointed_reports_whole_file_lines_and_restarts_without_resume():
+    with tempfile.TemporaryDirectory() as d:
+        src = Path(d) / "in.ndjson"
+        src.write_text('{"a": 1}\n\n{"a": 2}\n{"a": 3}\n{bad\n')
+        store = SQLiteStorage(Path(d) / "db.sqlite", schema="rows")
+        with pytest.raises(ParseError) as exc:
+            ingest_checkpointed(src, "ndjson", store, checkpoint_every=2)
+        assert exc.value.line == 5
+        with pytest.raises(ParseError) as exc:
+            ingest_checkpointed(src, "ndjson", store, checkpoint_every=2, resume=True)
+        assert exc.value.line == 5
+        src.write_text('{"a": 9}\n')
+        summary = ingest_checkpointed(src, "ndjson", store)
+        assert summary == {"format": "ndjson", "record_count": 1, "saved": True, "resumed_from": 0}
+        assert store.load() == [{"a": 9}]
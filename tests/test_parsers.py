@@ -5,7 +5,19 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from parsers import parse_csv, parse_json
+import pytest
+
+from parsers import (
+    ParseError,
+    iter_csv,
+    iter_json,
+    iter_lines,
+    iter_ndjson,
+    open_mmap,
+    parse_csv,
+    parse_json,
+    parse_ndjson,
+)
 
 
 def test_parse_json_array():
@@ -33,3 +45,82 @@ def test_parse_csv_lowercases_keys():
     assert parse_json(json_raw)[0]["Name"] == "a"
     assert "Name" not in parse_csv(csv_raw)[0]
     assert parse_csv(csv_raw)[0]["name"] == "a"
+
+
+def test_iter_csv_byte_chunks_split_mid_row():
+    chunks = [b"Name,count\nx", b",3\ny,5"]
+    assert list(iter_csv(chunks)) == parse_csv("Name,count\nx,3\ny,5")
+
+
+def test_iter_lines_decodes_split_utf8():
+    data = "é\nb".encode()
+    chunks = [data[:1], data[1:]]
+    assert list(iter_lines(chunks)) == ["é\n", "b"]
+
+
+def test_parse_csv_infer_types():
+    raw = "Name,count,score,zip\nx,3,1.5,007\ny,,2,01\nz,5,4,10"
+    got = parse_csv(raw, infer_types=True)
+    assert got[0] == {"name": "x", "count": 3, "score": 1.5, "zip": "007"}
+    assert got[1] == {"name": "y", "count": "", "score": 2.0, "zip": "01"}
+
+
+def test_iter_csv_sample_decides_types():
+    raw = "count\n1\n2\nthree"
+    assert [r["count"] for r in iter_csv(raw, infer_types=True, sample_size=1)] == [1, 2, "three"]
+    assert [r["count"] for r in iter_csv(raw, infer_types=True, sample_size=3)] == ["1", "2", "three"]
+
+
+def test_iter_csv_short_and_long_rows_match_dictreader():
+    raw = "a,b\n1\n\n2,3,4\n"
+    assert list(iter_csv(raw)) == [{"a": "1", "b": None}, {"a": "2", "b": "3", None: ["4"]}]
+
+
+def test_parse_ndjson_skips_blank_lines():
+    raw = '{"a": 1}\n\n{"a": 2}\r\n'
+    assert parse_ndjson(raw) == [{"a": 1}, {"a": 2}]
+
+
+def test_iter_ndjson_reports_line_number():
+    chunks = [b'{"a": 1}\n{"a": ', b'2}\n{bad}\n']
+    it = iter_ndjson(chunks)
+    assert next(it) == {"a": 1}
+    assert next(it) == {"a": 2}
+    with pytest.raises(ParseError) as exc:
+        next(it)
+    assert exc.value.line == 3
+
+
+def test_iter_ndjson_rejects_non_objects():
+    with pytest.raises(ParseError):
+        parse_ndjson("[1, 2]\n")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_iter_json_incremental_matches_parse_json(chunk_size):
+    raw = '[{"a": 1}, {"b": [1, 2, {"c": "x],"}]}, {"n": -1.5e3} , {"t": true}]'
+    data = raw.encode()
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    assert list(iter_json(chunks, chunk_size=chunk_size)) == parse_json(raw)
+
+
+def test_iter_json_single_object_and_empty_array():
+    assert list(iter_json(' {"Name": "x"} ', chunk_size=2)) == [{"Name": "x"}]
+    assert list(iter_json("[ ]", chunk_size=1)) == []
+
+
+@pytest.mark.parametrize("raw", ["[1, 2", "[1 2]", "[1]x", ""])
+def test_iter_json_rejects_malformed(raw):
+    with pytest.raises(ValueError):
+        list(iter_json(raw, chunk_size=2))
+
+
+def test_open_mmap_feeds_streaming_parsers(tmp_path):
+    path = tmp_path / "in.csv"
+    path.write_bytes("Name,count\né,3\ny,5\n".encode())
+    with open_mmap(path) as buf:
+        assert list(iter_csv(buf, chunk_size=4)) == parse_csv("Name,count\né,3\ny,5\n")
+    empty = tmp_path / "empty.json"
+    empty.write_bytes(b"")
+    with open_mmap(empty) as buf:
+        assert list(iter_lines(buf)) == []
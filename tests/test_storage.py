@@ -1,12 +1,17 @@
 """Tests for storage backends."""
 
+import asyncio
+import sqlite3
 import sys
 import tempfile
+import threading
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from storage import MemoryStorage, SQLiteStorage, get_storage
+import pytest
+
+from storage import MemoryStorage, SQLiteStorage, ThreadedStorage, get_async_storage, get_storage
 
 
 def test_memory_save_load():
@@ -60,3 +65,228 @@ def test_get_storage_sqlite():
         assert store.load() == [{"a": 1}]
     finally:
         Path(path).unlink(missing_ok=True)
+
+
+def test_sqlite_rows_schema_save_load():
+    with tempfile.TemporaryDirectory() as td:
+        store = SQLiteStorage(Path(td) / "r.db", schema="rows", batch_size=2)
+        records = [{"name": str(i), "count": i} for i in range(5)]
+        store.save(records)
+        assert store.load() == records
+        store.save([{"name": "only"}])
+        assert store.load() == [{"name": "only"}]
+
+
+def test_sqlite_rows_save_iter_rolls_back_on_error():
+    def gen():
+        yield {"a": 1}
+        raise RuntimeError("boom")
+
+    with tempfile.TemporaryDirectory() as td:
+        store = SQLiteStorage(Path(td) / "r.db", schema="rows")
+        store.save([{"a": 0}])
+        with pytest.raises(RuntimeError):
+            store.save_iter(gen())
+        assert store.load() == [{"a": 0}]
+
+
+def test_sqlite_rows_migrates_blob_database():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "legacy.db"
+        SQLiteStorage(path).save([{"x": 1}, {"x": 2}])
+        store = SQLiteStorage(path, schema="rows")
+        assert store.load() == [{"x": 1}, {"x": 2}]
+        # The blob payload is gone; a default open now follows the migrated layout.
+        assert SQLiteStorage(path).load() == [{"x": 1}, {"x": 2}]
+
+
+def test_sqlite_opens_in_recorded_layout_and_rejects_mismatch():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "s.db"
+        SQLiteStorage(path, schema="rows").save([{"n": 1}])
+        default = get_storage("sqlite", path)
+        assert default.load() == [{"n": 1}]
+        default.append([{"n": 2}])
+        assert SQLiteStorage(path, schema="rows").load() == [{"n": 1}, {"n": 2}]
+        with pytest.raises(ValueError):
+            SQLiteStorage(path, schema="blob")
+        # Databases written before the layout was recorded are detected by content.
+        with sqlite3.connect(path) as conn:
+            conn.execute("DELETE FROM storage_meta WHERE name = 'schema'")
+        assert SQLiteStorage(path).load() == [{"n": 1}, {"n": 2}]
+
+
+def test_memory_append_and_upsert():
+    store = MemoryStorage()
+    store.save([{"name": "a", "count": 1}])
+    assert store.append([{"name": "b", "count": 2}]) == 1
+    store.upsert([{"name": "a", "count": 9}, {"name": "c", "count": 3}], key="name")
+    assert store.load() == [{"name": "a", "count": 9}, {"name": "b", "count": 2}, {"name": "c", "count": 3}]
+    store.append([{"name": "d", "count": 4}])
+    store.upsert([{"name": "d", "count": 5}], key="name")
+    assert store.load()[-1] == {"name": "d", "count": 5}
+
+
+def test_memory_upsert_by_two_keys_keeps_every_record():
+    store = MemoryStorage()
+    store.save([{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+    store.upsert([{"id": 1, "name": "a"}], key="id")
+    store.upsert([{"id": 3, "name": "a"}], key="name")
+    store.upsert([{"id": 1, "name": "z"}], key="id")
+    assert store.load() == [{"id": 3, "name": "a"}, {"id": 2, "name": "b"}, {"id": 1, "name": "z"}]
+
+
+def test_memory_failed_upsert_or_append_leaves_store_unchanged():
+    store = MemoryStorage()
+    store.save([{"id": 1, "v": "a"}])
+    store.upsert([], key="id")
+    with pytest.raises(ValueError):
+        store.upsert([{"id": 1, "v": "b"}, {"id": 2, "v": "c"}, {"v": "nokey"}], key="id")
+    assert store.load() == [{"id": 1, "v": "a"}]
+
+    def broken():
+        yield {"id": 3, "v": "d"}
+        raise OSError("read failed")
+
+    with pytest.raises(OSError):
+        store.append(broken())
+    assert store.load() == [{"id": 1, "v": "a"}]
+    store.upsert([{"id": 1, "v": "e"}], key="id")
+    assert store.load() == [{"id": 1, "v": "e"}]
+
+
+def test_upsert_missing_key_raises():
+    with pytest.raises(ValueError):
+        MemoryStorage().upsert([{"count": 1}], key="name")
+
+
+@pytest.mark.parametrize("schema", ["blob", "rows"])
+def test_sqlite_append_and_upsert(schema):
+    with tempfile.TemporaryDirectory() as td:
+        store = SQLiteStorage(Path(td) / "u.db", schema=schema)
+        store.save([{"name": "a", "count": 1}, {"name": "b", "count": 2}])
+        store.append([{"name": "c", "count": 3}])
+        assert store.upsert([{"name": "b", "count": 20}, {"name": "d", "count": 4}], key="name") == 2
+        assert store.load() == [
+            {"name": "a", "count": 1},
+            {"name": "b", "count": 20},
+            {"name": "c", "count": 3},
+            {"name": "d", "count": 4},
+        ]
+
+
+def test_sqlite_rows_upsert_key_is_fixed_and_persisted():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "u.db"
+        store = SQLiteStorage(path, schema="rows")
+        store.upsert([{"name": "a", "count": 1}], key="name")
+        with pytest.raises(ValueError):
+            store.upsert([{"count": 1}], key="count")
+        reopened = SQLiteStorage(path, schema="rows")
+        reopened.upsert([{"name": "a", "count": 2}], key="name")
+        assert reopened.load() == [{"name": "a", "count": 2}]
+
+
+def test_sqlite_rows_save_resets_upsert_key_and_append_keeps_duplicates():
+    with tempfile.TemporaryDirectory() as td:
+        store = SQLiteStorage(Path(td) / "u.db", schema="rows")
+        store.upsert([{"name": "a", "count": 1}], key="name")
+        store.append([{"name": "a", "count": 2}, {"name": "a", "count": 3}])
+        store.upsert([{"name": "a", "count": 4}], key="name")
+        expected = [{"name": "a", "count": 1}, {"name": "a", "count": 2}, {"name": "a", "count": 4}]
+        assert store.load() == expected
+        memory = MemoryStorage()
+        memory.upsert([{"name": "a", "count": 1}], key="name")
+        memory.append([{"name": "a", "count": 2}, {"name": "a", "count": 3}])
+        memory.upsert([{"name": "a", "count": 4}], key="name")
+        assert memory.load() == expected
+
+        store.save([{"name": "b", "count": 1}, {"name": "b", "count": 2}])
+        assert store.load() == [{"name": "b", "count": 1}, {"name": "b", "count": 2}]
+        store.upsert([{"count": 2, "name": "c"}], key="count")
+        reopened = SQLiteStorage(Path(td) / "u.db", schema="rows")
+        assert reopened.load() == [{"name": "b", "count": 1}, {"count": 2, "name": "c"}]
+
+
+def test_sqlite_rows_upsert_rejects_duplicate_existing_keys():
+    with tempfile.TemporaryDirectory() as td:
+        store = SQLiteStorage(Path(td) / "u.db", schema="rows")
+        store.save([{"name": "a"}, {"name": "a"}])
+        with pytest.raises(ValueError):
+            store.upsert([{"name": "b"}], key="name")
+        assert store.load() == [{"name": "a"}, {"name": "a"}]
+
+
+def test_sqlite_persistent_wal_context_manager():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "w.db"
+        with SQLiteStorage(path, schema="rows", persistent=True, journal_mode="wal",
+                           synchronous="normal", cache_size=-2000, mmap_size=1 << 20) as store:
+            store.save([{"a": 1}])
+            store.append([{"a": 2}])
+            reader = SQLiteStorage(path, schema="rows")
+            assert reader.load() == [{"a": 1}, {"a": 2}]
+            with sqlite3.connect(path) as conn:
+                assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert store._conns == []
+        assert store.load() == [{"a": 1}, {"a": 2}]
+        store.close()
+
+
+def test_sqlite_rejects_unknown_pragma_values():
+    with tempfile.TemporaryDirectory() as td:
+        with pytest.raises(ValueError):
+            SQLiteStorage(Path(td) / "x.db", journal_mode="wal; DROP TABLE records")
+
+
+@pytest.mark.parametrize("backend", ["memory", "blob", "rows"])
+def test_load_pages_and_iter_records(backend):
+    records = [{"i": i} for i in range(7)]
+    with tempfile.TemporaryDirectory() as td:
+        if backend == "memory":
+            store = MemoryStorage()
+        else:
+            store = SQLiteStorage(Path(td) / "p.db", schema=backend)
+        store.save(records)
+        assert store.load(offset=2, limit=3) == records[2:5]
+        assert store.load(offset=5) == records[5:]
+        assert store.load(offset=10, limit=2) == []
+        assert list(store.iter_records(batch_size=3)) == records
+        assert list(store.iter_records(batch_size=7)) == records
+
+
+def test_load_rejects_negative_page():
+    with pytest.raises(ValueError):
+        MemoryStorage().load(offset=-1)
+
+
+def test_threaded_storage_runs_off_the_loop_thread():
+    class RecordingStorage(SQLiteStorage):
+        threads = set()
+
+        def save(self, records):
+            self.threads.add(threading.get_ident())
+            super().save(records)
+
+    async def run(path):
+        async with ThreadedStorage(RecordingStorage(path, schema="rows", persistent=True)) as store:
+            await store.save([{"k": 1, "v": "a"}])
+            assert await store.upsert([{"k": 1, "v": "b"}, {"k": 2, "v": "c"}], "k") == 2
+            assert await store.append([{"k": 3}]) == 1
+            return await store.load(), threading.get_ident()
+
+    with tempfile.TemporaryDirectory() as td:
+        loaded, loop_thread = asyncio.run(run(Path(td) / "a.db"))
+    assert loaded == [{"k": 1, "v": "b"}, {"k": 2, "v": "c"}, {"k": 3}]
+    assert RecordingStorage.threads and loop_thread not in RecordingStorage.threads
+
+
+def test_get_async_storage_memory():
+    async def run():
+        store = get_async_storage("memory")
+        await store.save([{"a": 1}])
+        records = await store.load(offset=0, limit=1)
+        await store.close()
+        return records
+
+    assert asyncio.run(run()) == [{"a": 1}]
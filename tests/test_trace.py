@@ -0,0 +1,416 @@
+"""Tests for the trace event logger."""
+
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+import trace
+
+
+@pytest.fixture
+def run_dir():
+    with tempfile.TemporaryDirectory() as d:
+        yield Path(d)
+        trace.close()
+
+
+def _events(run_dir):
+    return [json.loads(line) for line in (run_dir / "trace.jsonl").read_text().splitlines()]
+
+
+def test_flush_mode_writes_every_event(run_dir):
+    trace.init(run_dir)
+    trace.emit("a", "test", n=1)
+    [event] = _events(run_dir)
+    assert {k: v for k, v in event.items() if k != "ts"} == {"event": "a", "source": "test", "n": 1}
+
+
+def test_buffered_mode_holds_events_until_flush(run_dir):
+    trace.init(run_dir, durability="buffered", flush_interval=3600)
+    trace.emit("a", "test")
+    trace.emit("b", "test")
+    assert (run_dir / "trace.jsonl").read_text() == ""
+    trace.flush()
+    assert [e["event"] for e in _events(run_dir)] == ["a", "b"]
+
+
+def test_buffered_mode_flushes_on_size_and_time(run_dir):
+    trace.init(run_dir, durability="buffered", buffer_size=200, flush_interval=3600)
+    for i in range(5):
+        trace.emit("e", "test", i=i)
+    assert 0 < len(_events(run_dir)) < 5
+    trace.init(run_dir, durability="buffered", flush_interval=0)
+    trace.emit("now", "test")
+    assert [e["event"] for e in _events(run_dir)] == ["now"]
+
+
+def test_buffered_mode_flushes_quiet_process_on_timer(run_dir):
+    trace.init(run_dir, durability="buffered", flush_interval=0.05)
+    trace.emit("a", "test")
+    assert (run_dir / "trace.jsonl").read_text() == ""
+    deadline = time.monotonic() + 5
+    while not (run_dir / "trace.jsonl").read_text() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert [e["event"] for e in _events(run_dir)] == ["a"]
+
+
+def test_close_and_reinit_flush_pending_events(run_dir):
+    trace.init(run_dir, durability="buffered", flush_interval=3600)
+    trace.emit("a", "test")
+    trace.close()
+    assert [e["event"] for e in _events(run_dir)] == ["a"]
+
+    other = run_dir / "other"
+    other.mkdir()
+    trace.init(run_dir, durability="buffered", flush_interval=3600)
+    trace.emit("b", "test")
+    trace.init(other, durability="fsync")
+    assert [e["event"] for e in _events(run_dir)] == ["b"]
+    trace.emit("c", "test")
+    assert [e["event"] for e in _events(other)] == ["c"]
+
+
+def test_init_rejects_unknown_durability(run_dir):
+    with pytest.raises(ValueError):
+        trace.init(run_dir, durability="sometimes")
+
+
+def test_async_writer_preserves_order_and_reports_summary(run_dir):
+    trace.init(run_dir, async_=True, durability="buffered")
+    for i in range(500):
+        trace.emit("e", "test", i=i)
+    trace.flush()
+    assert [e["i"] for e in _events(run_dir)] == list(range(500))
+    trace.close()
+    events = _events(run_dir)
+    assert events[-1]["event"] == "trace_summary" and events[-1]["dropped"] == 0
+
+
+def test_async_writer_drop_policy_counts_dropped_events(run_dir):
+    trace.init(run_dir, async_=True, queue_size=2, overflow="drop")
+    writer = trace._output
+    with writer._lock:  # stall the writer thread so the queue fills
+        for i in range(10):
+            trace.emit("e", "test", i=i)
+    trace.close()
+    events = _events(run_dir)
+    summary = events.pop()
+    assert summary["event"] == "trace_summary"
+    assert summary["dropped"] >= 7
+    assert len(events) + summary["dropped"] == 10
+    assert [e["i"] for e in events] == sorted(e["i"] for e in events)
+
+
+def test_async_writer_survives_unwritable_events(run_dir):
+    trace.init(run_dir, async_=True, queue_size=2)
+    trace.emit("bad", "test", value=object())
+    for i in range(10):
+        trace.emit("e", "test", i=i)
+    trace.flush()
+    assert [e["i"] for e in _events(run_dir)] == list(range(10))
+    trace.close()
+    summary = _events(run_dir)[-1]
+    assert (summary["event"], summary["write_errors"], summary["dropped"]) == ("trace_summary", 1, 0)
+
+
+def test_async_writer_stops_waiting_on_dead_thread(run_dir):
+    trace.init(run_dir, async_=True, queue_size=2)
+    writer = trace._output
+    writer._queue.put(trace._STOP)  # ends the thread as a crash would
+    writer._thread.join()
+    for i in range(5):
+        trace.emit("e", "test", i=i)
+    trace.flush()
+    trace.close()
+    assert _events(run_dir)[-1]["dropped"] == 3
+
+
+def test_init_rejects_unknown_overflow(run_dir):
+    with pytest.raises(ValueError):
+        trace.init(run_dir, async_=True, overflow="spill")
+
+
+def test_sampling_rate_head_and_token_bucket(run_dir):
+    trace.init(run_dir, sampling={
+        "often": {"rate": 0.25},
+        "start": {"head": 3},
+        "*": {"per_second": 0.001, "burst": 2},
+    })
+    for i in range(20):
+        trace.emit("often", "test", i=i)
+        trace.emit("start", "test", i=i)
+        trace.emit("other", "test", i=i)
+    trace.close()
+    events = _events(run_dir)
+    summary = events.pop()
+    kept = {}
+    for e in events:
+        kept.setdefault(e["event"], []).append(e["i"])
+    assert kept == {"often": [0, 4, 8, 12, 16], "start": [0, 1, 2], "other": [0, 1]}
+    assert summary["event"] == "trace_summary"
+    assert summary["sampled_out"] == {"often": 15, "start": 17, "other": 18}
+
+
+def test_sampling_rejects_bad_rules(run_dir):
+    with pytest.raises(ValueError):
+        trace.init(run_dir, sampling={"e": {"every": 2}})
+    with pytest.raises(ValueError):
+        trace.init(run_dir, sampling={"e": {"rate": 2}})
+
+
+def test_span_nesting_decorator_and_errors(run_dir):
+    trace.init(run_dir)
+
+    @trace.span("inner", "test.fn", kind="decorated")
+    def inner():
+        return 42
+
+    with trace.span("outer", "test") as outer:
+        assert inner() == 42
+        outer.set(items=3)
+    with pytest.raises(KeyError):
+        with trace.span("failing", "test"):
+            raise KeyError("x")
+    trace.close()
+    inner_ev, outer_ev, failing = _events(run_dir)
+    assert (inner_ev["name"], outer_ev["name"], failing["name"]) == ("inner", "outer", "failing")
+    assert inner_ev["parent_id"] == outer_ev["span_id"] and outer_ev["parent_id"] is None
+    assert inner_ev["kind"] == "decorated" and outer_ev["items"] == 3
+    assert outer_ev["start_ns"] <= inner_ev["start_ns"] <= inner_ev["end_ns"] <= outer_ev["end_ns"]
+    assert outer_ev["duration_ns"] == outer_ev["end_ns"] - outer_ev["start_ns"]
+    assert failing["error"] == "KeyError" and failing["parent_id"] is None
+
+
+def test_span_records_nothing_without_output(capsys):
+    trace.close()
+    with trace.span("quiet", "test"):
+        pass
+    assert capsys.readouterr().err == ""
+
+
+@pytest.mark.parametrize("compress", [None, "gzip", "bz2", "lzma"])
+def test_rotation_by_event_count_and_iter_events(run_dir, compress):
+    trace.init(run_dir, max_events=3, compress=compress)
+    for i in range(10):
+        trace.emit("e", "test", i=i)
+    trace.close()
+    names = sorted(p.name for p in run_dir.iterdir())
+    ext = {None: "", "gzip": ".gz", "bz2": ".bz2", "lzma": ".xz"}[compress]
+    assert names == sorted(["trace.jsonl"] + [f"trace.{n}.jsonl{ext}" for n in (1, 2, 3)])
+    assert [e["i"] for e in trace.iter_events(run_dir)] == list(range(10))
+    assert [e["i"] for e in trace.iter_events(run_dir / "trace.jsonl")] == list(range(10))
+
+
+@pytest.mark.parametrize("encoding", ["json", "binary"])
+def test_rotation_is_safe_across_emitting_threads(run_dir, encoding):
+    trace.init(run_dir, max_events=50, encoding=encoding)
+
+    def work(t):
+        for i in range(500):
+            trace.emit("e", "test", t=t, i=i)
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    trace.close()
+    events = list(trace.iter_events(run_dir))
+    assert len(events) == 8 * 500
+    for t in range(8):
+        assert [e["i"] for e in events if e["t"] == t] == list(range(500))
+
+
+def test_rotation_by_size_and_reinit_clears_segments(run_dir):
+    trace.init(run_dir, max_bytes=300, durability="buffered")
+    for i in range(20):
+        trace.emit("e", "test", i=i)
+    trace.close()
+    segments = list(run_dir.glob("trace.*.jsonl"))
+    assert len(segments) > 1
+    assert all(p.stat().st_size <= 300 for p in segments)
+    assert [e["i"] for e in trace.iter_events(run_dir)] == list(range(20))
+    trace.init(run_dir)
+    trace.close()
+    assert [p.name for p in run_dir.iterdir()] == ["trace.jsonl"]
+    assert list(trace.iter_events(run_dir)) == []
+
+
+def test_init_rejects_unknown_compression(run_dir):
+    with pytest.raises(ValueError):
+        trace.init(run_dir, max_events=1, compress="zip")
+
+
+def test_binary_encoding_roundtrip_matches_json(run_dir):
+    data = {"n": 5, "neg": -3, "big": 2**70, "f": 1.5, "s": "é", "none": None, "flag": True,
+            "items": [1, "two", [False]], "nested": {"k": {"deep": 0}}}
+    trace.init(run_dir, encoding="binary")
+    for i in range(3):
+        trace.emit("e", "test", i=i, **data)
+    trace.close()
+    assert not (run_dir / "trace.jsonl").exists()
+    assert (run_dir / "trace.bin").read_bytes().startswith(trace.BINARY_MAGIC)
+    ts_ns, event, source, payload = next(trace.iter_binary(run_dir / "trace.bin"))
+    assert (event, source, payload) == ("e", "test", {"i": 0, **data})
+    assert isinstance(ts_ns, int)
+    events = list(trace.iter_events(run_dir))
+    assert [{k: v for k, v in e.items() if k != "ts"} for e in events] == [
+        {"event": "e", "source": "test", "i": i, **data} for i in range(3)
+    ]
+    assert events[0]["ts"] == trace._iso(ts_ns)
+
+
+def test_binary_encoding_rotates_with_per_segment_strings(run_dir):
+    trace.init(run_dir, encoding="binary", max_events=2, compress="gzip")
+    for i in range(5):
+        trace.emit("e", "test", i=i)
+    trace.close()
+    assert sorted(p.name for p in run_dir.iterdir()) == [
+        "trace.1.bin.gz", "trace.2.bin.gz", "trace.bin",
+    ]
+    assert [e["i"] for e in trace.iter_events(run_dir)] == list(range(5))
+    # A later JSON trace in the same dir replaces the binary files.
+    trace.init(run_dir)
+    trace.close()
+    assert [p.name for p in run_dir.iterdir()] == ["trace.jsonl"]
+
+
+def test_binary_encoding_interns_safely_across_threads(run_dir):
+    trace.init(run_dir, encoding="binary")
+
+    def work(t):
+        for i in range(300):
+            trace.emit(f"e{t}_{i % 50}", f"src{t}", **{f"k{t}_{i % 7}": i})
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    trace.close()
+    assert len(list(trace.iter_events(run_dir))) == 8 * 300
+
+
+def test_binary_encoding_rejects_unserializable_values(run_dir):
+    trace.init(run_dir, encoding="binary")
+    with pytest.raises(TypeError):
+        trace.emit("e", "test", value=object())
+    trace.emit("e", "test", value=1)
+    trace.close()
+    assert [e["value"] for e in trace.iter_events(run_dir)] == [1]
+
+
+def test_ring_buffer_keeps_last_events_and_dumps_on_request(run_dir):
+    trace.init(run_dir, ring_size=4)
+    for i in range(10):
+        trace.emit("e", "test", i=i)
+    assert not (run_dir / "trace.jsonl").exists()
+    assert trace.dump() == run_dir / "trace.jsonl"
+    *events, marker = _events(run_dir)
+    assert [e["i"] for e in events] == [6, 7, 8, 9]
+    assert marker["event"] == "trace_dump"
+    assert (marker["reason"], marker["buffered"], marker["overwritten"]) == ("request", 4, 6)
+    trace.close()
+    assert trace.dump() is None
+
+
+def test_ring_buffer_dumps_on_exception_and_signal(run_dir):
+    if not hasattr(signal, "SIGUSR1"):
+        pytest.skip("no SIGUSR1 on this platform")
+    prev_hook, prev_handler = sys.excepthook, signal.getsignal(signal.SIGUSR1)
+    seen = []
+    sys.excepthook = lambda *args: seen.append(args[0])
+    try:
+        trace.init(run_dir, ring_size=8)
+        trace.emit("before", "test")
+        sys.excepthook(KeyError, KeyError("x"), None)
+        *_, marker = _events(run_dir)
+        assert (marker["reason"], marker["error"]) == ("exception", "KeyError")
+        assert seen == [KeyError]
+
+        trace.emit("later", "test")
+        os.kill(os.getpid(), signal.SIGUSR1)
+        names = [e["event"] for e in _events(run_dir)]
+        assert names == ["before", "later", "trace_dump"]
+
+        trace.close()
+        assert signal.getsignal(signal.SIGUSR1) is prev_handler
+        assert sys.excepthook is not None and sys.excepthook.__name__ == "<lambda>"
+    finally:
+        sys.excepthook = prev_hook
+
+
+def test_ring_buffer_rejects_async_and_rotation(run_dir):
+    with pytest.raises(ValueError):
+        trace.init(run_dir, ring_size=4, async_=True)
+    with pytest.raises(ValueError):
+        trace.init(run_dir, ring_size=4, max_events=10)
+
+
+@pytest.mark.parametrize("encoding", ["json", "binary"])
+def test_ring_buffer_dump_writes_unencodable_events_as_repr(run_dir, encoding):
+    trace.init(run_dir, ring_size=4, encoding=encoding)
+    trace.emit("a", "test", i=0)
+    trace.emit("bad", "test", value={1, 2})
+    trace.emit("b", "test", i=1)
+    trace.dump()
+    a, bad, b, marker = trace.iter_events(run_dir)
+    assert (a["i"], b["i"]) == (0, 1)
+    assert bad["repr"] == repr({"value": {1, 2}})
+    assert marker["unencodable"] == 1
+    assert [p.name for p in run_dir.iterdir()] == [f"trace.{'bin' if encoding == 'binary' else 'jsonl'}"]
+
+
+def test_ring_buffer_signal_during_dump_and_failing_hook(run_dir, monkeypatch):
+    if not hasattr(signal, "SIGUSR1"):
+        pytest.skip("no SIGUSR1 on this platform")
+    prev_hook = sys.excepthook
+    seen = []
+    sys.excepthook = lambda *args: seen.append(args[0])
+    try:
+        trace.init(run_dir, ring_size=4)
+        trace.emit("e", "test")
+        ring = trace._output
+        with ring._dump_lock:  # a dump in progress in this thread
+            os.kill(os.getpid(), signal.SIGUSR1)
+        assert not (run_dir / "trace.jsonl").exists()
+
+        def broken(*args, **kwargs):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(ring, "dump", broken)
+        sys.excepthook(KeyError, KeyError("x"), None)
+        assert seen == [KeyError]
+        trace.close()
+    finally:
+        sys.excepthook = prev_hook
+
+
+def test_spanned_names_methods_after_the_runtime_class(run_dir):
+    class Base:
+        @trace.spanned(source="test.{cls}")
+        def save(self):
+            return "saved"
+
+    class Child(Base):
+        pass
+
+    @trace.spanned("plain", "test.fn")
+    def fn():
+        return 1
+
+    trace.init(run_dir)
+    assert Child().save() == "saved" and fn() == 1
+    trace.close()
+    method, plain = _events(run_dir)
+    assert (method["name"], method["source"]) == ("save", "test.Child")
+    assert (plain["name"], plain["source"]) == ("plain", "test.fn")
@@ -20,4 +20,65 @@ def test_emit_trace_commit_author_selection():
         assert len(trace_files) >= 1
         content = trace_files[0].read_text()
         assert "commit_author_selection" in content
-        assert "Brent" in content
\ No newline at end of file
+        assert "Brent" in content
+
+def test_consolidated_store_random_access_and_latest_wins():
+    from analysis.trace_emitter import TraceStore, close_stores
+
+    with tempfile.TemporaryDirectory() as td:
+        run_path = Path(td)
+        for q in range(3):
+            emit_trace(run_path, q, "validate_config", {"q": q}, "success", consolidated=True)
+        emit_trace(run_path, 1, "validate_config", {"q": 1}, "retry", consolidated=True)
+        close_stores()
+        assert list((run_path / "traces").glob("*.json")) == []
+        store = TraceStore(run_path)
+        assert len(store) == 3
+        assert store.get(2, "validate_config")["params"] == {"q": 2}
+        assert store.get(1, "validate_config")["outcome"] == "retry"
+        assert store.get(5, "validate_config") is None
+
+
+def test_consolidated_store_ignores_index_entries_past_data_end():
+    from analysis.trace_emitter import TraceStore
+
+    with tempfile.TemporaryDirectory() as td:
+        run_path = Path(td)
+        store = TraceStore(run_path)
+        store.append(0, "a", {"decision_point": "a"})
+        store.close()
+        with open(run_path / "traces" / TraceStore.INDEX, "a") as f:
+            f.write('[1, "b", 10000, 20]\n[2, "c", 0')
+        assert TraceStore(run_path).keys() == [(0, "a")]
+
+
+def test_load_traces_reads_both_layouts():
+    from analysis.trace_emitter import close_stores, load_traces
+    from analysis.scripts.explainability_diff import load_traces as diff_load_traces
+
+    with tempfile.TemporaryDirectory() as td:
+        run_path = Path(td)
+        emit_trace(run_path, 0, "commit_author_selection", {"author": "Brent"}, "success")
+        emit_trace(run_path, 1, "commit_author_selection", {"author": "Ana"}, "success", consolidated=True)
+        close_stores()
+        traces = load_traces(run_path)
+        assert sorted(traces) == ["trace_0_commit_author_selection", "trace_1_commit_author_selection"]
+        assert traces["trace_1_commit_author_selection"]["params"] == {"author": "Ana"}
+        assert diff_load_traces(run_path) == traces
+
+
+def test_consolidated_emit_reopens_store_after_run_dir_is_recreated():
+    import shutil
+
+    from analysis.trace_emitter import TraceStore, close_stores
+
+    with tempfile.TemporaryDirectory() as td:
+        run_path = Path(td) / "run"
+        emit_trace(run_path, 0, "old", {}, "success", consolidated=True)
+        shutil.rmtree(run_path)
+        run_path.mkdir()
+        emit_trace(run_path, 0, "new", {}, "success", consolidated=True)
+        close_stores()
+        store = TraceStore(run_path)
+        assert store.keys() == [(0, "new")]
+        assert store.first()["decision_point"] == "new"
@@ -7,7 +7,17 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 import pytest
 
-from validation import SchemaError, SemanticError, validate
+import validation
+from validation import (
+    SchemaError,
+    SemanticError,
+    ValidationError,
+    compile_schema,
+    validate,
+    validate_all,
+    validate_columnar,
+    validate_record,
+)
 
 
 def test_valid_record():
@@ -42,3 +52,101 @@ def test_empty_required_field():
     with pytest.raises(SchemaError) as exc:
         validate([{"name": "", "count": 1}], required=["name", "count"])
     assert "required field name is empty" in str(exc.value)
+
+
+COMPILED_CASES = [
+    [{"name": "x", "count": 3}],
+    [{"name": "x"}],
+    [{"name": "", "count": 1}],
+    [{"name": "x", "count": "not-a-number"}],
+    [{"name": 5, "count": 1}],
+    [{"name": "x", "count": "7"}, {"name": "y", "count": -1}],
+    [{"name": "x", "count": None}],
+]
+
+
+@pytest.mark.parametrize("records", COMPILED_CASES)
+def test_compiled_schema_matches_validate(records):
+    kwargs = {"required": ["name", "count"], "types": {"name": str, "count": int}, "min_count": 0}
+    schema = compile_schema(**kwargs)
+    try:
+        validate(records, **kwargs)
+    except ValidationError as e:
+        expected = (type(e), str(e), e.index)
+    else:
+        expected = None
+    for i, rec in enumerate(records):
+        try:
+            validate_record(rec, i, **kwargs)
+        except ValidationError as e:
+            assert expected == (type(e), str(e), e.index)
+            break
+    try:
+        schema.validate(records)
+    except ValidationError as e:
+        assert expected == (type(e), str(e), e.index)
+    else:
+        assert expected is None
+
+
+def test_compiled_schema_is_reusable():
+    schema = compile_schema(["name"], {"count": int}, 1)
+    schema.validate([{"name": "a", "count": "2"}])
+    with pytest.raises(SemanticError) as exc:
+        schema.validate([{"name": "a", "count": 1}, {"name": "b", "count": 0}])
+    assert exc.value.index == 1
+
+
+def test_validate_all_groups_and_caps_indices():
+    records = [{"name": "x", "count": -1} for _ in range(5)] + [{"count": 1}]
+    report = validate_all(records, required=["name"], min_count=0, max_indices=3)
+    assert not report.ok
+    out = report.to_dict()
+    assert out["records_checked"] == 6
+    assert out["error_count"] == 6
+    groups = {(g["error"], g["field"]): g for g in out["groups"]}
+    semantic = groups[("SemanticError", "count")]
+    assert semantic["count"] == 5
+    assert semantic["first_indices"] == [0, 1, 2]
+    assert groups[("SchemaError", "name")]["first_indices"] == [5]
+
+
+def test_validate_all_reports_one_error_per_bad_field():
+    records = [{"name": "", "count": "abc"}, {"name": "x", "count": -1}]
+    report = validate_all(records, required=["name"], types={"name": str, "count": int}, min_count=0)
+    out = report.to_dict()
+    assert out["error_count"] == 3
+    assert out["failed_records"] == 2
+    groups = {(g["error"], g["field"]): g["first_indices"] for g in out["groups"]}
+    assert groups == {("SchemaError", "name"): [0], ("SchemaError", "count"): [0], ("SemanticError", "count"): [1]}
+
+
+def test_validate_all_clean_report():
+    report = validate_all([{"name": "x", "count": 1}], required=["name"], min_count=0)
+    assert report.ok
+    assert report.first_index is None
+
+
+COLUMNAR_CASES = COMPILED_CASES + [
+    [{"name": "a", "count": "5"}, {"count": 2}, {"name": "b", "count": -4}],
+    [{"name": "a", "count": -1}, {"name": "b", "count": "x"}],
+    [{"name": "a"}, {"name": "b", "count": 3}],
+    [],
+]
+
+
+@pytest.mark.parametrize("records", COLUMNAR_CASES)
+def test_columnar_matches_validate(records, monkeypatch):
+    kwargs = {"required": ["name"], "types": {"name": str, "count": int}, "min_count": 0}
+
+    def outcome(fn):
+        try:
+            fn(records, **kwargs)
+        except ValidationError as e:
+            return (type(e), str(e), e.index)
+        return None
+
+    expected = outcome(validate)
+    assert outcome(validate_columnar) == expected
+    monkeypatch.setattr(validation, "_np", None)
+    assert outcome(validate_columnar) == expected
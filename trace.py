@@ -1,26 +1,873 @@
 """Minimal trace/event logger for run-time evidence."""
 
+import atexit
+import bz2
+import contextvars
+import functools
+import gzip
+import itertools
 import json
+import lzma
+import math
+import os
+import queue
+import re
+import shutil
+import signal
+import struct
 import sys
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import IO, Any, Callable, Iterator
 
-_output = None
+DURABILITY = ("flush", "buffered", "fsync")
+BUFFER_SIZE = 1 << 16
+FLUSH_INTERVAL = 1.0
+OVERFLOW = ("block", "drop")
+QUEUE_SIZE = 10_000
+COMPRESSION = {"gzip": (".gz", gzip.open), "bz2": (".bz2", bz2.open), "lzma": (".xz", lzma.open)}
+_OPENERS = {ext: opener for ext, opener in COMPRESSION.values()}
+_SEGMENT_RE = re.compile(r"trace\.(\d+)\.(jsonl|bin)(\.gz|\.bz2|\.xz)?")
+ENCODINGS = ("json", "binary")
+BINARY_MAGIC = b"CPLTRACE\x01"
 
 
-def init(run_dir: Path) -> None:
-    """Start writing trace events to run_dir/trace.jsonl."""
-    global _output
-    _output = open(run_dir / "trace.jsonl", "w")
+def _iso(ts_ns: int) -> str:
+    return datetime.fromtimestamp(ts_ns // 1_000_000_000).replace(microsecond=ts_ns // 1000 % 1_000_000).isoformat()
+
+
+def _line(ts_ns: int, event: str, source: str, data: dict[str, Any]) -> str:
+    record = {"ts": _iso(ts_ns), "event": event, "source": source, **data}
+    return json.dumps(record) + "\n"
+
+
+class _JsonEncoding:
+    """One JSON object per line (trace.jsonl)."""
+
+    suffix = ".jsonl"
+    mode = "w"
+    header = ""
+    empty = ""
+
+    def encode(self, ts_ns: int, event: str, source: str, data: dict[str, Any]) -> str:
+        return _line(ts_ns, event, source, data)
+
+    def reset(self) -> None:
+        pass
+
+
+# Binary trace layout (trace.bin): BINARY_MAGIC, then records, each a varint
+# byte length followed by a body whose first byte is the record kind:
+#   _STRING_DEF: UTF-8 text; strings are numbered 0, 1, ... in file order
+#   _EVENT:      int64 ns timestamp, varint event id, varint source id, packed data map
+# Values are packed msgpack-style: one tag byte (or a 0x00-0x7f fixint) then
+# the payload. Event/source names and map keys are interned per file, so a
+# repeated name costs one varint after its first use.
+_STRING_DEF, _EVENT = 1, 2
+_NIL, _FALSE, _TRUE = 0xC0, 0xC2, 0xC3
+_INT, _BIGINT, _FLOAT = 0xD3, 0xC7, 0xCB
+_STR, _REF, _LIST, _MAP = 0xD9, 0xD4, 0xDC, 0xDE
+_Q = struct.Struct("<q")
+_D = struct.Struct("<d")
+
+
+def _varint(n: int, out: bytearray) -> None:
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    n = shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+class _BinaryEncoding:
+    """Length-prefixed binary records with interned strings (trace.bin); see the layout above."""
+
+    suffix = ".bin"
+    mode = "wb"
+    header = BINARY_MAGIC
+    empty = b""
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+
+    def reset(self) -> None:
+        """Forget interned strings; called when a new file starts."""
+        self._ids.clear()
+
+    def _ref(self, s: str, out: bytearray) -> int:
+        i = self._ids.get(s)
+        if i is None:
+            i = self._ids[s] = len(self._ids)
+            body = bytearray([_STRING_DEF])
+            body += s.encode()
+            _varint(len(body), out)
+            out += body
+        return i
+
+    def _pack(self, v: Any, body: bytearray, out: bytearray) -> None:
+        if v is None:
+            body.append(_NIL)
+        elif v is True:
+            body.append(_TRUE)
+        elif v is False:
+            body.append(_FALSE)
+        elif isinstance(v, int):
+            if 0 <= v < 0x80:
+                body.append(v)
+            elif -(1 << 63) <= v < (1 << 63):
+                body.append(_INT)
+                body += _Q.pack(v)
+            else:
+                digits = str(int(v)).encode()
+                body.append(_BIGINT)
+                _varint(len(digits), body)
+                body += digits
+        elif isinstance(v, float):
+            body.append(_FLOAT)
+            body += _D.pack(v)
+        elif isinstance(v, str):
+            raw = v.encode()
+            body.append(_STR)
+            _varint(len(raw), body)
+            body += raw
+        elif isinstance(v, (list, tuple)):
+            body.append(_LIST)
+            _varint(len(v), body)
+            for item in v:
+                self._pack(item, body, out)
+        elif isinstance(v, dict):
+            body.append(_MAP)
+            _varint(len(v), body)
+            for k, item in v.items():
+                if isinstance(k, str):
+                    body.append(_REF)
+                    _varint(self._ref(k, out), body)
+                else:
+                    self._pack(k, body, out)
+                self._pack(item, body, out)
+        else:
+            raise TypeError(f"Object of type {type(v).__name__} is not trace serializable")
+
+    def encode(self, ts_ns: int, event: str, source: str, data: dict[str, Any]) -> bytes:
+        out = bytearray()  # string definitions first, then the event record
+        body = bytearray([_EVENT])
+        body += _Q.pack(ts_ns)
+        known = len(self._ids)
+        try:
+            _varint(self._ref(event, out), body)
+            _varint(self._ref(source, out), body)
+            self._pack(data, body, out)
+        except Exception:
+            # The definitions in `out` are never written; forget their ids too.
+            for s in list(self._ids)[known:]:
+                del self._ids[s]
+            raise
+        _varint(len(body), out)
+        out += body
+        return bytes(out)
+
+
+def _unpack(buf: bytes, pos: int, strings: list[str]) -> tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag < 0x80:
+        return tag, pos
+    if tag == _STR:
+        n, pos = _read_varint(buf, pos)
+        return buf[pos:pos + n].decode(), pos + n
+    if tag == _REF:
+        i, pos = _read_varint(buf, pos)
+        return strings[i], pos
+    if tag == _INT:
+        return _Q.unpack_from(buf, pos)[0], pos + 8
+    if tag == _FLOAT:
+        return _D.unpack_from(buf, pos)[0], pos + 8
+    if tag == _NIL:
+        return None, pos
+    if tag == _TRUE:
+        return True, pos
+    if tag == _FALSE:
+        return False, pos
+    if tag == _MAP:
+        n, pos = _read_varint(buf, pos)
+        out = {}
+        for _ in range(n):
+            k, pos = _unpack(buf, pos, strings)
+            out[k], pos = _unpack(buf, pos, strings)
+        return out, pos
+    if tag == _LIST:
+        n, pos = _read_varint(buf, pos)
+        items = []
+        for _ in range(n):
+            item, pos = _unpack(buf, pos, strings)
+            items.append(item)
+        return items, pos
+    if tag == _BIGINT:
+        n, pos = _read_varint(buf, pos)
+        return int(buf[pos:pos + n]), pos + n
+    raise ValueError(f"bad trace value tag 0x{tag:02x} at byte {pos - 1}")
+
+
+def iter_binary(source: str | Path | bytes) -> Iterator[tuple[int, str, str, dict[str, Any]]]:
+    """Decode one binary trace file (or its bytes) into (ts_ns, event, source, data) tuples."""
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        with _OPENERS.get(path.suffix, open)(path, "rb") as f:
+            buf = f.read()
+    else:
+        buf = source
+    if not buf.startswith(BINARY_MAGIC):
+        raise ValueError("not a binary trace file")
+    strings: list[str] = []
+    pos = len(BINARY_MAGIC)
+    end = len(buf)
+    while pos < end:
+        n, pos = _read_varint(buf, pos)
+        stop = pos + n
+        kind = buf[pos]
+        if kind == _STRING_DEF:
+            strings.append(buf[pos + 1:stop].decode())
+        elif kind == _EVENT:
+            ts_ns = _Q.unpack_from(buf, pos + 1)[0]
+            event, p = _read_varint(buf, pos + 9)
+            source_id, p = _read_varint(buf, p)
+            data, _ = _unpack(buf, p, strings)
+            yield ts_ns, strings[event], strings[source_id], data
+        else:
+            raise ValueError(f"bad trace record kind {kind} at byte {pos}")
+        pos = stop
+
+
+class _Rotation:
+    """Size/event-count rotation for the active trace file (trace.jsonl or trace.bin).
+
+    When the active file would pass max_bytes, or already holds max_events
+    events, it is renamed to trace.<n>.jsonl (or .bin; n = 1, 2, ... oldest
+    first) and, if compress is set, streamed into trace.<n>.jsonl.gz/.bz2/.xz
+    and removed. A fresh active file then takes new events. iter_events
+    reads the segments back in order.
+    """
+
+    def __init__(self, path: Path, max_bytes: int | None, max_events: int | None, compress: str | None) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_events = max_events
+        self.compress = compress
+        self.segments = 0
+        self.events = 0
+        self.size = 0
+
+    def due(self, chunk: str | bytes) -> bool:
+        if not self.events:
+            return False
+        return (self.max_events is not None and self.events >= self.max_events) or (
+            self.max_bytes is not None and self.size + len(chunk) > self.max_bytes
+        )
+
+    def count(self, chunk: str | bytes) -> None:
+        self.events += 1
+        self.size += len(chunk)  # json.dumps output is ASCII, so chars == bytes
+
+    def rotate(self, f: IO) -> None:
+        """Close f, move it to the next segment and compress it."""
+        f.close()
+        self.segments += 1
+        segment = self.path.with_name(f"trace.{self.segments}{self.path.suffix}")
+        os.replace(self.path, segment)
+        if self.compress:
+            ext, opener = COMPRESSION[self.compress]
+            with open(segment, "rb") as src, opener(f"{segment}{ext}", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            segment.unlink()
+        self.events = self.size = 0
+
+
+def _open_trace(path: Path, encoding: _JsonEncoding | _BinaryEncoding) -> IO:
+    f = open(path, encoding.mode)
+    f.write(encoding.header)
+    return f
+
+
+class _Writer:
+    """Encodes events and writes them to a file according to a durability mode.
+
+    "flush" (default) flushes every event to the OS, so a crashed process
+    loses nothing. "buffered" batches lines in memory and writes them once
+    buffer_size bytes are pending, at flush()/close() and at exit, and
+    every flush_interval seconds from a background "trace-flusher" thread
+    (so a process that goes quiet still gets its events on disk); a hard
+    crash loses at most the pending batch. "fsync" flushes and fsyncs every
+    event, so events survive a machine crash too, at the highest cost.
+    record() may be called from several threads: encoding, rotation and
+    the write happen under one lock.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        encoding: _JsonEncoding | _BinaryEncoding,
+        durability: str,
+        buffer_size: int,
+        flush_interval: float,
+        rotation: _Rotation | None = None,
+    ) -> None:
+        self._path = path
+        self._encoding = encoding
+        self._f = _open_trace(path, encoding)
+        self._rotation = rotation
+        self._durability = durability
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._pending: list[str | bytes] = []
+        self._pending_size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()  # file, pending batch and rotation, across emitting threads and the flusher
+        self._stop = threading.Event()
+        self._flusher = None
+        if durability == "buffered" and 0 < flush_interval < math.inf:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="trace-flusher", daemon=True)
+            self._flusher.start()
+
+    def emit(self, event: str, source: str, data: dict[str, Any]) -> None:
+        self.record(time.time_ns(), event, source, data)
+
+    def record(self, ts_ns: int, event: str, source: str, data: dict[str, Any]) -> None:
+        with self._lock:
+            # Interned string ids are shared state: a definition must reach
+            # the file before any event using it, whichever thread encodes.
+            chunk = self._encoding.encode(ts_ns, event, source, data)
+            if self._rotation:
+                if self._rotation.due(chunk):
+                    self._flush()
+                    self._rotation.rotate(self._f)
+                    # Interned strings are per file, so re-encode for the new one.
+                    self._encoding.reset()
+                    self._f = _open_trace(self._path, self._encoding)
+                    chunk = self._encoding.encode(ts_ns, event, source, data)
+                self._rotation.count(chunk)
+            self._write(chunk)
+
+    def _write(self, line: str | bytes) -> None:
+        if self._durability != "buffered":
+            self._f.write(line)
+            self._f.flush()
+            if self._durability == "fsync":
+                os.fsync(self._f.fileno())
+            return
+        self._pending.append(line)
+        self._pending_size += len(line)
+        if self._pending_size >= self._buffer_size or time.monotonic() - self._last_flush >= self._flush_interval:
+            self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            self._f.write(self._encoding.empty.join(self._pending))
+            self._pending.clear()
+            self._pending_size = 0
+        self._f.flush()
+        self._last_flush = time.monotonic()
+
+    def _flush_periodically(self) -> None:
+        while not self._stop.wait(self._flush_interval):
+            with self._lock:
+                if self._pending and time.monotonic() - self._last_flush >= self._flush_interval:
+                    self._flush()
+
+    def close(self, summary: dict[str, Any] | None = None, event: str = "trace_summary") -> None:
+        """Flush and close, writing a closing event (trace_summary by default) first if summary is given."""
+        if self._flusher:
+            self._stop.set()
+            self._flusher.join()
+        try:
+            if summary:
+                self.record(time.time_ns(), event, "trace", summary)
+            self.flush()
+        finally:
+            self._f.close()
+
+
+_STOP = object()
+
+
+class _AsyncWriter:
+    """Hands events to a background thread that serializes and writes them.
+
+    emit() only timestamps the event and puts it on a bounded queue. When
+    the queue is full, overflow="block" waits for room and overflow="drop"
+    discards the event and counts it. An event the thread cannot write (an
+    unserializable value, an OSError) is counted in write_errors instead of
+    raising as it would in sync mode, and the thread carries on. close()
+    drains the queue and writes a final trace_summary event carrying the
+    dropped and write_errors counts. Should the thread die anyway, emit
+    counts events as dropped and flush/close stop waiting on it.
+    """
+
+    def __init__(self, writer: _Writer, queue_size: int, overflow: str) -> None:
+        self._writer = writer
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._block = overflow == "block"
+        self._lock = threading.Lock()  # serializes access to the file writer
+        self._drop_lock = threading.Lock()
+        self.dropped = 0
+        self.write_errors = 0
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: str, source: str, data: dict[str, Any]) -> None:
+        item = (time.time_ns(), event, source, data)
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        while self._block and self._thread.is_alive():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        with self._drop_lock:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                with self._lock:
+                    self._writer.record(*item)
+            except Exception:
+                self.write_errors += 1
+            finally:
+                self._queue.task_done()
+
+    def _wait(self) -> None:
+        """Wait until the queue is drained, or until the thread is gone."""
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._thread.is_alive():
+                self._queue.all_tasks_done.wait(0.1)
+
+    def flush(self) -> None:
+        """Wait until every queued event is written, then flush the file."""
+        self._wait()
+        with self._lock:
+            self._writer.flush()
+
+    def close(self, summary: dict[str, Any] | None = None) -> None:
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        self._writer.close({"dropped": self.dropped, "write_errors": self.write_errors, **(summary or {})})
+
+
+class _RingBuffer:
+    """Keeps the last `size` events in memory and writes them only on dump().
+
+    emit() stores the raw (ts_ns, event, source, data) tuple in a
+    preallocated slot; nothing is serialized until a dump. dump() rewrites
+    the trace file with the buffered events, oldest first, followed by a
+    trace_dump event giving the reason and how many older events were
+    overwritten. While active, an uncaught exception (main or any thread)
+    dumps before the previous excepthook runs, and SIGUSR1 dumps on demand
+    where the platform has it and init runs in the main thread.
+    """
+
+    def __init__(self, path: Path, codec: _JsonEncoding | _BinaryEncoding, size: int) -> None:
+        if size < 1:
+            raise ValueError(f"ring buffer size must be >= 1, got {size}")
+        self._path = path
+        self._codec = codec
+        self._size = size
+        self._slots: list[tuple | None] = [None] * size
+        self._seq = itertools.count()
+        self._dump_lock = threading.Lock()
+        self._hooks: dict[str, Any] = {}
+        self._install_hooks()
+
+    def emit(self, event: str, source: str, data: dict[str, Any]) -> None:
+        i = next(self._seq)
+        self._slots[i % self._size] = (i, time.time_ns(), event, source, data)
+
+    def dump(self, reason: str, blocking: bool = True, **extra: Any) -> Path | None:
+        """Write the buffered events; returns None if blocking=False and a dump is already running.
+
+        Events that cannot be encoded are written with their payload as
+        {"repr": repr(data)} and counted in the trace_dump event. The dump
+        goes to a temporary file that replaces the trace file only when
+        complete, so a failed dump leaves the previous one in place.
+        """
+        if not self._dump_lock.acquire(blocking):
+            return None
+        try:
+            events = sorted(e for e in self._slots if e is not None)
+            total = events[-1][0] + 1 if events else 0
+            self._codec.reset()
+            tmp = self._path.with_name(self._path.name + ".tmp")
+            writer = _Writer(tmp, self._codec, "buffered", BUFFER_SIZE, math.inf)
+            unencodable = 0
+            try:
+                for _, ts_ns, event, source, data in events:
+                    try:
+                        writer.record(ts_ns, event, source, data)
+                    except (TypeError, ValueError):
+                        unencodable += 1
+                        writer.record(ts_ns, event, source, {"repr": repr(data)})
+                summary = {"reason": reason, "buffered": len(events), "overwritten": total - len(events), **extra}
+                if unencodable:
+                    summary["unencodable"] = unencodable
+                writer.close(summary, event="trace_dump")
+            except BaseException:
+                writer._f.close()
+                tmp.unlink(missing_ok=True)
+                raise
+            os.replace(tmp, self._path)
+        finally:
+            self._dump_lock.release()
+        return self._path
+
+    def flush(self) -> None:
+        pass
+
+    def close(self, summary: dict[str, Any] | None = None) -> None:
+        """Uninstall the dump hooks. Buffered events are discarded, not written."""
+        if sys.excepthook is self._hooks.get("sys"):
+            sys.excepthook = self._hooks["prev_sys"]
+        if threading.excepthook is self._hooks.get("threading"):
+            threading.excepthook = self._hooks["prev_threading"]
+        if "prev_signal" in self._hooks:
+            try:
+                if signal.getsignal(signal.SIGUSR1) is self._hooks["signal"]:
+                    signal.signal(signal.SIGUSR1, self._hooks["prev_signal"])
+            except ValueError:  # not in the main thread
+                pass
+
+    def _install_hooks(self) -> None:
+        prev_sys, prev_threading = sys.excepthook, threading.excepthook
+
+        def safe_dump(reason: str, blocking: bool = True, **extra: Any) -> None:
+            # Never let a failed dump replace the error being reported.
+            try:
+                self.dump(reason, blocking, **extra)
+            except Exception as exc:
+                sys.stderr.write(f"trace: {reason} dump failed: {exc!r}\n")
+
+        def sys_hook(exc_type: Any, exc: Any, tb: Any) -> None:
+            safe_dump("exception", error=exc_type.__name__)
+            prev_sys(exc_type, exc, tb)
+
+        def threading_hook(args: Any) -> None:
+            safe_dump("exception", error=args.exc_type.__name__, thread=getattr(args.thread, "name", None))
+            prev_threading(args)
+
+        def on_signal(signum: int, frame: Any) -> None:
+            # The handler may interrupt a dump in this same thread; the lock is not reentrant.
+            safe_dump("signal", blocking=False)
+
+        self._hooks = {"sys": sys_hook, "prev_sys": prev_sys, "threading": threading_hook,
+                       "prev_threading": prev_threading, "signal": on_signal}
+        sys.excepthook = sys_hook
+        threading.excepthook = threading_hook
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            self._hooks["prev_signal"] = signal.signal(signal.SIGUSR1, on_signal)
+
+
+class _Sampler:
+    """Per-event-name sampling rules, applied in emit before any formatting.
+
+    rules maps an event name, or "*" for every other event, to a dict with
+    any of: rate (keep that fraction, deterministically: the first event and
+    then evenly spaced ones), head (keep only the first N), per_second and
+    burst (token bucket: per_second tokens refill per second, up to burst,
+    default max(1, per_second)). State is kept per event name; an event is
+    written only if every rule in its dict passes. Discarded events are
+    counted per name in sampled_out.
+    """
+
+    KEYS = {"rate", "head", "per_second", "burst"}
+
+    def __init__(self, rules: dict[str, dict[str, float]]) -> None:
+        for name, rule in rules.items():
+            unknown = set(rule) - self.KEYS
+            if unknown:
+                raise ValueError(f"unknown sampling keys for {name}: {sorted(unknown)}")
+            if "rate" in rule and not 0 <= rule["rate"] <= 1:
+                raise ValueError(f"sampling rate for {name} must be in [0, 1], got {rule['rate']}")
+        self._rules = rules
+        self._state: dict[str, list[float]] = {}  # name -> [seen, tokens, last refill]
+        self._lock = threading.Lock()
+        self.sampled_out: dict[str, int] = {}
+
+    def keep(self, event: str) -> bool:
+        rule = self._rules.get(event) or self._rules.get("*")
+        if not rule:
+            return True
+        with self._lock:
+            state = self._state.get(event)
+            now = time.monotonic()
+            if state is None:
+                state = self._state[event] = [0, rule.get("burst", max(1, rule.get("per_second", 1))), now]
+            n = state[0]
+            state[0] += 1
+            ok = True
+            if "head" in rule and n >= rule["head"]:
+                ok = False
+            if ok and "rate" in rule:
+                rate = rule["rate"]
+                ok = rate > 0 and (n == 0 or int(n * rate) != int((n - 1) * rate))
+            if ok and "per_second" in rule:
+                burst = rule.get("burst", max(1, rule["per_second"]))
+                state[1] = min(burst, state[1] + (now - state[2]) * rule["per_second"])
+                state[2] = now
+                if state[1] >= 1:
+                    state[1] -= 1
+                else:
+                    ok = False
+            if not ok:
+                self.sampled_out[event] = self.sampled_out.get(event, 0) + 1
+            return ok
+
+
+_output: _Writer | _AsyncWriter | _RingBuffer | None = None
+_sampler: _Sampler | None = None
+
+
+def init(
+    run_dir: Path,
+    *,
+    durability: str = "flush",
+    buffer_size: int = BUFFER_SIZE,
+    flush_interval: float = FLUSH_INTERVAL,
+    async_: bool = False,
+    queue_size: int = QUEUE_SIZE,
+    overflow: str = "block",
+    sampling: dict[str, dict[str, float]] | None = None,
+    max_bytes: int | None = None,
+    max_events: int | None = None,
+    compress: str | None = None,
+    encoding: str = "json",
+    ring_size: int | None = None,
+) -> None:
+    """Start writing trace events to run_dir/trace.jsonl. Closes any previous trace file.
+
+    durability picks the safety/throughput trade-off: "flush", "buffered"
+    or "fsync" (see _Writer). buffer_size and flush_interval apply to
+    "buffered": pending events are written once buffer_size bytes pile up
+    and at least every flush_interval seconds, by a background thread.
+    async_=True moves serialization and writing to a background thread fed
+    by a queue of queue_size events; overflow is "block" or "drop" (see _AsyncWriter).
+    sampling maps event names (or "*") to rate/head/token-bucket rules (see
+    _Sampler); counts of sampled-out events go in the closing trace_summary.
+    max_bytes/max_events rotate the file into numbered segments, compressed
+    with compress ("gzip", "bz2" or "lzma") when given (see _Rotation).
+    encoding="binary" writes run_dir/trace.bin instead: length-prefixed
+    records with interned names, ns timestamps and packed payloads (see
+    _BinaryEncoding); iter_events and iter_binary read it back. Segments and
+    trace files left by an earlier trace in run_dir are removed.
+    ring_size=N keeps only the last N events in memory and writes them on
+    trace.dump(), an uncaught exception or SIGUSR1 (see _RingBuffer);
+    it cannot be combined with async_ or rotation.
+    """
+    global _output, _sampler
+    if durability not in DURABILITY:
+        raise ValueError(f"unknown durability: {durability}")
+    if overflow not in OVERFLOW:
+        raise ValueError(f"unknown overflow policy: {overflow}")
+    if compress is not None and compress not in COMPRESSION:
+        raise ValueError(f"unknown compression: {compress}")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unknown encoding: {encoding}")
+    if ring_size is not None and (async_ or max_bytes is not None or max_events is not None):
+        raise ValueError("ring_size cannot be combined with async_, max_bytes or max_events")
+    sampler = _Sampler(sampling) if sampling else None
+    close()
+    _sampler = sampler
+    codec = _BinaryEncoding() if encoding == "binary" else _JsonEncoding()
+    run_dir = Path(run_dir)
+    for stale in [*_segments(run_dir), run_dir / "trace.jsonl", run_dir / "trace.bin"]:
+        stale.unlink(missing_ok=True)
+    path = run_dir / f"trace{codec.suffix}"
+    if ring_size is not None:
+        _output = _RingBuffer(path, codec, ring_size)
+        return
+    rotation = None
+    if max_bytes is not None or max_events is not None:
+        rotation = _Rotation(path, max_bytes, max_events, compress)
+    writer = _Writer(path, codec, durability, buffer_size, flush_interval, rotation)
+    _output = _AsyncWriter(writer, queue_size, overflow) if async_ else writer
 
 
 def emit(event: str, source: str, **data: Any) -> None:
     """Emit a structured event. source = where it came from (e.g. module.fn)."""
-    record = {"ts": datetime.now().isoformat(), "event": event, "source": source, **data}
-    line = json.dumps(record) + "\n"
     if _output:
-        _output.write(line)
-        _output.flush()
+        if _sampler and not _sampler.keep(event):
+            return
+        _output.emit(event, source, data)
     else:
-        sys.stderr.write(line)
+        sys.stderr.write(_line(time.time_ns(), event, source, data))
+
+
+_span_ids = itertools.count(1)
+_current_span: contextvars.ContextVar[int | None] = contextvars.ContextVar("trace_span", default=None)
+
+
+class _Span:
+    """Timed region; see span()."""
+
+    def __init__(self, name: str, source: str, data: dict[str, Any]) -> None:
+        self.name = name
+        self.source = source
+        self.data = data
+        self.span_id: int | None = None
+        self._token: contextvars.Token | None = None
+
+    def set(self, **data: Any) -> None:
+        """Add fields to the span event (e.g. a count known only at the end)."""
+        self.data.update(data)
+
+    def __enter__(self) -> "_Span":
+        if _output is None:
+            return self
+        self.span_id = next(_span_ids)
+        self._parent_id = _current_span.get()
+        self._token = _current_span.set(self.span_id)
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if self._token is None:
+            return
+        end = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        self._token = None
+        if exc_type is not None:
+            self.data["error"] = exc_type.__name__
+        emit(
+            "span", self.source,
+            name=self.name, span_id=self.span_id, parent_id=self._parent_id,
+            start_ns=self._start, end_ns=end, duration_ns=end - self._start,
+            **self.data,
+        )
+
+    def __call__(self, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with _Span(self.name, self.source, dict(self.data)):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def span(name: str, source: str, **data: Any) -> _Span:
+    """Time a block (with trace.span(...)) or every call of a function (@trace.span(...)).
+
+    On exit one "span" event is emitted with name, span_id, parent_id (the
+    enclosing span in this thread/task, or None), start_ns/end_ns from
+    time.perf_counter_ns, duration_ns, data, and error (the exception class
+    name) if the block raised. Spans cost almost nothing and record nothing
+    unless a trace file is open (init), so they never spill onto stderr.
+    """
+    return _Span(name, source, data)
+
+
+def spanned(name: str | None = None, source: str = "", **data: Any) -> Callable[[Callable], Callable]:
+    """Decorator recording every call as a span; name defaults to the function's name.
+
+    For methods, "{cls}" in source is filled with the class of the instance
+    at call time, so an inherited method is attributed to the subclass.
+    """
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+        if "{cls}" not in source:
+            return _Span(span_name, source, data)(fn)
+
+        @functools.wraps(fn)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+            with _Span(span_name, source.format(cls=type(self).__name__), dict(data)):
+                return fn(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def dump(reason: str = "request") -> Path | None:
+    """In ring-buffer mode, write the buffered events to the trace file and return its path.
+
+    Returns None when no ring buffer is active.
+    """
+    if isinstance(_output, _RingBuffer):
+        return _output.dump(reason)
+    return None
+
+
+def flush() -> None:
+    """Write any buffered or queued events to the trace file."""
+    if _output:
+        _output.flush()
+
+
+def close() -> None:
+    """Flush and close the trace file. Later events go to stderr until the next init."""
+    global _output, _sampler
+    output, _output = _output, None
+    sampler, _sampler = _sampler, None
+    if output:
+        output.close({"sampled_out": sampler.sampled_out} if sampler else None)
+
+
+def _segments(run_dir: Path) -> list[Path]:
+    """Rotated segments in run_dir, oldest first."""
+    found = []
+    for p in run_dir.glob("trace.*"):
+        m = _SEGMENT_RE.fullmatch(p.name)
+        if m:
+            found.append((int(m.group(1)), p))
+    return [p for _, p in sorted(found)]
+
+
+def iter_events(run_dir: str | Path) -> Iterator[dict[str, Any]]:
+    """Yield every event of a trace in order: rotated segments (decompressed), then the active file.
+
+    Reads JSON and binary traces alike; binary events come back in the
+    JSON shape (ts as ISO text). run_dir may also be the trace.jsonl or
+    trace.bin path itself. Yields nothing if there is no trace.
+    """
+    run_dir = Path(run_dir)
+    if run_dir.name in ("trace.jsonl", "trace.bin"):
+        run_dir = run_dir.parent
+    paths = _segments(run_dir)
+    paths += [p for p in (run_dir / "trace.jsonl", run_dir / "trace.bin") if p.exists()]
+    for path in paths:
+        if ".bin" in path.suffixes:
+            for ts_ns, event, source, data in iter_binary(path):
+                yield {"ts": _iso(ts_ns), "event": event, "source": source, **data}
+            continue
+        opener = _OPENERS.get(path.suffix, open)
+        with opener(path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+atexit.register(close)
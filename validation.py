@@ -1,15 +1,35 @@
 """Schema and semantic validation for records."""
 
+from array import array
+from collections.abc import Callable, Iterable
+from itertools import repeat
+from operator import methodcaller
 from typing import Any
 
+try:
+    import numpy as _np
+except ImportError:
+    _np = None
+
+try:
+    import trace as _trace
+except ImportError:
+    _trace = None
+
+_spanned = _trace.spanned if _trace else lambda *args, **kwargs: lambda fn: fn
+
+
+_MISSING = object()
+
 
 class ValidationError(Exception):
     """Base for validation errors."""
 
-    def __init__(self, msg: str, index: int | None = None):
+    def __init__(self, msg: str, index: int | None = None, field: str | None = None):
         super().__init__(msg)
         self.msg = msg
         self.index = index
+        self.field = field
 
 
 class SchemaError(ValidationError):
@@ -20,6 +40,15 @@ class SemanticError(ValidationError):
     """Technically valid but logically wrong."""
 
 
+class ValidationReportError(ValidationError):
+    """Raised after a collect-all pass found errors. report holds the details."""
+
+    def __init__(self, report: "ValidationReport"):
+        super().__init__(report.summary(), index=report.first_index)
+        self.report = report
+
+
+@_spanned("validate", "validation.validate")
 def validate(
     records: list[dict[str, Any]],
     *,
@@ -28,33 +57,348 @@ def validate(
     min_count: int | None = None,
 ) -> None:
     """Validate records. Raises SchemaError or SemanticError on failure."""
-    required = required or []
-    types = types or {}
-
-    for i, rec in enumerate(records):
-        for field in required:
-            if field not in rec:
-                raise SchemaError(f"missing required field: {field}", index=i)
-            if rec[field] is None or rec[field] == "":
-                raise SchemaError(f"required field {field} is empty", index=i)
-
-        for field, expected in types.items():
-            if field not in rec:
+    compile_schema(required or [], types or {}, min_count).validate(records)
+
+
+def validate_record(
+    rec: dict[str, Any],
+    index: int,
+    *,
+    required: list[str],
+    types: dict[str, type],
+    min_count: int | None = None,
+) -> None:
+    """Validate a single record at position index. Same checks as validate.
+
+    Interprets the schema on every call; use compile_schema for many records.
+    """
+    for field in required:
+        if field not in rec:
+            raise SchemaError(f"missing required field: {field}", index=index, field=field)
+        if rec[field] is None or rec[field] == "":
+            raise SchemaError(f"required field {field} is empty", index=index, field=field)
+
+    for field, expected in types.items():
+        if field not in rec:
+            continue
+        val = rec[field]
+        if expected == int:
+            try:
+                int(val)
+            except (TypeError, ValueError):
+                raise SchemaError(f"{field} must be int, got {type(val).__name__}", index=index, field=field)
+        elif not isinstance(val, expected):
+            raise SchemaError(f"{field} must be {expected.__name__}, got {type(val).__name__}", index=index, field=field)
+
+    if min_count is not None and "count" in rec:
+        try:
+            c = int(rec["count"])
+        except (TypeError, ValueError):
+            raise SchemaError(f"count field is not numeric: {rec['count']!r}", index=index, field="count")
+        else:
+            if c < min_count:
+                raise SemanticError(f"count must be >= {min_count}, got {c}", index=index, field="count")
+
+
+Check = Callable[[dict[str, Any], int], None]
+
+
+def _required_check(field: str) -> Check:
+    missing = f"missing required field: {field}"
+    empty = f"required field {field} is empty"
+
+    def check(rec: dict[str, Any], index: int) -> None:
+        val = rec.get(field, _MISSING)
+        if val is _MISSING:
+            raise SchemaError(missing, index=index, field=field)
+        if val is None or val == "":
+            raise SchemaError(empty, index=index, field=field)
+
+    return check
+
+
+def _int_check(field: str) -> Check:
+    def check(rec: dict[str, Any], index: int) -> None:
+        val = rec.get(field, _MISSING)
+        if val is _MISSING or type(val) is int:
+            return
+        try:
+            int(val)
+        except (TypeError, ValueError):
+            raise SchemaError(f"{field} must be int, got {type(val).__name__}", index=index, field=field)
+
+    return check
+
+
+def _isinstance_check(field: str, expected: type) -> Check:
+    def check(rec: dict[str, Any], index: int) -> None:
+        val = rec.get(field, _MISSING)
+        if val is not _MISSING and not isinstance(val, expected):
+            raise SchemaError(f"{field} must be {expected.__name__}, got {type(val).__name__}", index=index, field=field)
+
+    return check
+
+
+def _min_count_check(min_count: int) -> Check:
+    def check(rec: dict[str, Any], index: int) -> None:
+        val = rec.get("count", _MISSING)
+        if val is _MISSING:
+            return
+        if type(val) is int:
+            c = val
+        else:
+            try:
+                c = int(val)
+            except (TypeError, ValueError):
+                raise SchemaError(f"count field is not numeric: {val!r}", index=index, field="count")
+        if c < min_count:
+            raise SemanticError(f"count must be >= {min_count}, got {c}", index=index, field="count")
+
+    return check
+
+
+class CompiledSchema:
+    """Reusable validator: per-field checks are built once, in validate's order."""
+
+    def __init__(
+        self,
+        required: list[str],
+        types: dict[str, type],
+        min_count: int | None = None,
+    ) -> None:
+        self.required = list(required)
+        self.types = dict(types)
+        self.min_count = min_count
+        checks = [_required_check(f) for f in self.required]
+        fields = list(self.required)
+        for field, expected in self.types.items():
+            checks.append(_int_check(field) if expected == int else _isinstance_check(field, expected))
+            fields.append(field)
+        if min_count is not None:
+            checks.append(_min_count_check(min_count))
+            fields.append("count")
+        self._checks = tuple(checks)
+        self._field_checks = tuple(zip(fields, checks))
+
+    def __reduce__(self):
+        # Closures do not pickle; rebuild from the spec (e.g. in a worker process).
+        return (type(self), (self.required, self.types, self.min_count))
+
+    def check(self, rec: dict[str, Any], index: int) -> None:
+        """Validate one record at position index."""
+        for check in self._checks:
+            check(rec, index)
+
+    def validate(self, records: Iterable[dict[str, Any]]) -> None:
+        """Validate records in order. Raises on the first failure."""
+        checks = self._checks
+        for i, rec in enumerate(records):
+            for check in checks:
+                check(rec, i)
+
+    def collect(self, rec: dict[str, Any], index: int, report: "ValidationReport") -> bool:
+        """Run the checks on one record, adding failures to report. True if it passed.
+
+        Once a field fails, its later checks are skipped, so one bad value
+        (e.g. a non-numeric count with both types and min_count set) is
+        reported once.
+        """
+        failed: set[str] = set()
+        for field, check in self._field_checks:
+            if field in failed:
                 continue
-            val = rec[field]
+            try:
+                check(rec, index)
+            except ValidationError as e:
+                report.add(e)
+                failed.add(field)
+        ok = not failed
+        report.records_checked += 1
+        if not ok:
+            report.failed_records += 1
+        return ok
+
+    def validate_all(self, records: Iterable[dict[str, Any]], max_indices: int = 10) -> "ValidationReport":
+        """Single pass over all records; returns a report instead of raising."""
+        report = ValidationReport(max_indices)
+        for i, rec in enumerate(records):
+            self.collect(rec, i, report)
+        return report
+
+    def validate_columnar(self, records: list[dict[str, Any]]) -> None:
+        """Column-at-a-time validate with the same errors and first failing index.
+
+        Records are transposed once into per-field columns and each check runs
+        as one pass over its column using C-level builtins (map, set, min) or
+        NumPy for the min_count threshold. Only the earliest failing record is
+        then re-checked row-wise to raise the exact error validate would.
+        """
+        n = len(records)
+        first = n
+        fields = dict.fromkeys([*self.required, *self.types, *(["count"] if self.min_count is not None else [])])
+        columns = {f: list(map(methodcaller("get", f, _MISSING), records)) for f in fields}
+        converted: dict[str, list[int]] = {}
+
+        for field in self.required:
+            col = columns[field]
+            if _MISSING in col or None in col or "" in col:
+                first = _first_failure(col, _is_present, first)
+
+        for field, expected in self.types.items():
+            col = columns[field]
+            vals = [v for v in col if v is not _MISSING] if _MISSING in col else col
             if expected == int:
+                if set(map(type, vals)) <= {int}:
+                    if vals is col:
+                        converted[field] = col
+                    continue
                 try:
-                    int(val)
-                except (TypeError, ValueError):
-                    raise SchemaError(f"{field} must be int, got {type(val).__name__}", index=i)
-            elif not isinstance(val, expected):
-                raise SchemaError(f"{field} must be {expected.__name__}, got {type(val).__name__}", index=i)
+                    ints = list(map(int, vals))
+                except (TypeError, ValueError, OverflowError):
+                    first = _first_failure(col, _is_int_or_missing, first)
+                else:
+                    if vals is col:
+                        converted[field] = ints
+            elif not all(map(isinstance, vals, repeat(expected))):
+                first = _first_failure(col, lambda v, t=expected: v is _MISSING or isinstance(v, t), first)
 
-        if min_count is not None and "count" in rec:
-            try:
-                c = int(rec["count"])
-            except (TypeError, ValueError):
-                raise SchemaError(f"count field is not numeric: {rec['count']!r}", index=i)
-            else:
-                if c < min_count:
-                    raise SemanticError(f"count must be >= {min_count}, got {c}", index=i)
+        if self.min_count is not None:
+            first = min(first, _first_below(columns["count"], self.min_count, converted.get("count")))
+
+        if first < n:
+            self.check(records[first], first)
+
+
+def _is_present(val: Any) -> bool:
+    return not (val is _MISSING or val is None or val == "")
+
+
+def _is_int_or_missing(val: Any) -> bool:
+    if val is _MISSING:
+        return True
+    try:
+        int(val)
+    except (TypeError, ValueError, OverflowError):
+        return False
+    return True
+
+
+def _first_failure(col: list[Any], ok: Callable[[Any], bool], limit: int) -> int:
+    """Index of the first value in col[:limit] failing ok, else limit."""
+    for i in range(limit):
+        if not ok(col[i]):
+            return i
+    return limit
+
+
+def _first_below(col: list[Any], min_count: int, counts: list[int] | None = None) -> int:
+    """First index whose count is non-numeric or below min_count; len(col) if none.
+
+    Missing values are replaced by min_count so they pass. counts, if given, is
+    col already converted with int().
+    """
+    n = len(col)
+    if counts is None:
+        vals = [min_count if v is _MISSING else v for v in col] if _MISSING in col else col
+        try:
+            counts = list(map(int, vals))
+        except (TypeError, ValueError, OverflowError):
+            return _first_failure(vals, lambda v: _is_int_or_missing(v) and int(v) >= min_count, n)
+    if _np is not None:
+        try:
+            arr = _np.fromiter(counts, dtype=_np.int64, count=n)
+        except OverflowError:
+            pass
+        else:
+            below = _np.flatnonzero(arr < min_count)
+            return int(below[0]) if len(below) else n
+    try:
+        packed = array("q", counts)
+    except OverflowError:
+        packed = counts
+    if not packed or min(packed) >= min_count:
+        return n
+    return next(i for i, c in enumerate(packed) if c < min_count)
+
+
+def compile_schema(
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+) -> CompiledSchema:
+    """Build a CompiledSchema. Same semantics and messages as validate."""
+    return CompiledSchema(required or [], types or {}, min_count)
+
+
+class ValidationReport:
+    """Errors from a collect-all pass, grouped by (error class, field).
+
+    Each group keeps a count, the first message and at most max_indices
+    record indices, so the report stays small however bad the input is.
+    """
+
+    def __init__(self, max_indices: int = 10) -> None:
+        self.max_indices = max_indices
+        self.records_checked = 0
+        self.error_count = 0
+        self.failed_records = 0
+        self.first_index: int | None = None
+        self._groups: dict[tuple[str, str | None], dict[str, Any]] = {}
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def add(self, err: ValidationError) -> None:
+        self.error_count += 1
+        if self.first_index is None:
+            self.first_index = err.index
+        key = (type(err).__name__, err.field)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = {
+                "error": key[0],
+                "field": key[1],
+                "count": 0,
+                "first_message": err.msg,
+                "first_indices": [],
+            }
+        group["count"] += 1
+        if len(group["first_indices"]) < self.max_indices:
+            group["first_indices"].append(err.index)
+
+    def summary(self) -> str:
+        return f"{self.error_count} validation errors in {len(self._groups)} groups ({self.records_checked} records checked)"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "records_checked": self.records_checked,
+            "failed_records": self.failed_records,
+            "error_count": self.error_count,
+            "groups": [dict(g, first_indices=list(g["first_indices"])) for g in self._groups.values()],
+        }
+
+
+@_spanned("validate_columnar", "validation.validate_columnar")
+def validate_columnar(
+    records: list[dict[str, Any]],
+    *,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+) -> None:
+    """Columnar counterpart of validate for large in-memory batches. Same errors."""
+    compile_schema(required, types, min_count).validate_columnar(records)
+
+
+@_spanned("validate_all", "validation.validate_all")
+def validate_all(
+    records: Iterable[dict[str, Any]],
+    *,
+    required: list[str] | None = None,
+    types: dict[str, type] | None = None,
+    min_count: int | None = None,
+    max_indices: int = 10,
+) -> ValidationReport:
+    """Collect-all counterpart of validate: one pass, returns a capped ValidationReport."""
+    return compile_schema(required, types, min_count).validate_all(records, max_indices)